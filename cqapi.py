@@ -0,0 +1,141 @@
+import functools
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from cqhttp import CQHttp, Error
+
+logger = logging.getLogger('QQBot')
+
+# 可以安全重试的HTTP状态码, 这些情况下请求没有被CQHTTP处理
+RETRY_STATUS = (502, 503, 504)
+
+
+class ApiStats(object):
+    """记录每个API调用的次数, 失败次数和耗时."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # API名称 -> [调用次数, 失败次数, 重试次数, 总耗时, 最大耗时]
+        self._actions = dict()
+
+    def record(self, action: str, latency: float,
+               failed: bool = False, retries: int = 0):
+        """记录一次API调用."""
+        with self._lock:
+            stat = self._actions.setdefault(action, [0, 0, 0, 0.0, 0.0])
+            stat[0] += 1
+            stat[1] += int(failed)
+            stat[2] += retries
+            stat[3] += latency
+            stat[4] = max(stat[4], latency)
+
+    def snapshot(self) -> dict:
+        """返回每个API的统计数据."""
+        with self._lock:
+            return {
+                action: {
+                    'calls': stat[0],
+                    'failures': stat[1],
+                    'retries': stat[2],
+                    'avg_latency': stat[3] / stat[0] if stat[0] else 0.0,
+                    'max_latency': stat[4],
+                }
+                for action, stat in self._actions.items()
+            }
+
+    def summary(self) -> str:
+        """返回一行可以写入日志的统计信息."""
+        return '; '.join(
+            f'{action}: {stat["calls"]}次, 失败{stat["failures"]}次, '
+            f'重试{stat["retries"]}次, 平均{stat["avg_latency"] * 1000:.0f}ms, '
+            f'最长{stat["max_latency"] * 1000:.0f}ms'
+            for action, stat in sorted(self.snapshot().items())
+        )
+
+
+class PooledCQHttp(CQHttp):
+    """使用长连接池调用CQHTTP API的CQHttp.
+    所有API调用共用一个``requests.Session``, 连接会被复用,
+    并且设置了连接和读取超时, 连接失败时带随机抖动地有限次重试.
+    ### Args:
+    ``api_root``: CQHTTP API的地址.\n
+    ``pool_size``: 连接池的大小, 应当不小于同时发送的线程数.\n
+    ``timeout``: (连接超时, 读取超时), 单位是秒.\n
+    ``retries``: 最多重试的次数.\n
+    ``backoff``: 第一次重试前等待的秒数, 之后每次加倍.\n
+    ### Attributes:
+    ``call_action``: 调用指定的API.\n
+    ``stats``: API调用的统计数据.\n
+    """
+
+    def __init__(self, api_root: str, access_token: str = None,
+                 secret: str = None, pool_size: int = 10,
+                 timeout: tuple = (3, 10), retries: int = 2,
+                 backoff: float = 0.2):
+        super().__init__(api_root=api_root, access_token=access_token,
+                         secret=secret)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = ApiStats()
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=0)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        if access_token:
+            self._session.headers['Authorization'] = 'Token ' + access_token
+
+    def __getattr__(self, item):
+        if item.startswith('_'):
+            raise AttributeError(item)
+        return functools.partial(self.call_action, item)
+
+    def call_action(self, action: str, **params):
+        """调用指定的API.
+        ### Args:
+        ``action``: API的名称, 例如``send_group_msg``.\n
+        ``params``: API的参数.\n
+        ### Result:
+        ``data``: API返回的数据.\n
+        """
+        url = f'{self._api_root}/{action}'
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                resp = self._session.post(url, json=params,
+                                          timeout=self.timeout)
+                if resp.status_code not in RETRY_STATUS:
+                    break
+                error = Error(resp.status_code)
+            except requests.ReadTimeout:
+                # 读取超时时请求可能已经被处理, 不重试以免重复发送
+                self.stats.record(action, time.monotonic() - start,
+                                  True, attempt)
+                raise
+            except requests.ConnectionError as e:
+                error = e
+            if attempt >= self.retries:
+                self.stats.record(action, time.monotonic() - start,
+                                  True, attempt)
+                raise error
+            delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            attempt += 1
+            logger.debug('调用%s失败, %.2f秒后第%d次重试: %s',
+                         action, delay, attempt, str(error))
+            time.sleep(delay)
+        latency = time.monotonic() - start
+        if resp.ok:
+            data = resp.json()
+            if data.get('status') != 'failed':
+                self.stats.record(action, latency, False, attempt)
+                return data.get('data')
+            self.stats.record(action, latency, True, attempt)
+            raise Error(resp.status_code, data.get('retcode'))
+        self.stats.record(action, latency, True, attempt)
+        raise Error(resp.status_code)
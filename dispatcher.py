@@ -0,0 +1,188 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger('QQBot')
+
+
+class TokenBucket(object):
+    """令牌桶限流器.
+    ### Args:
+    ``rate``: 每秒补充的令牌数.\n
+    ``burst``: 令牌桶的容量, 即允许的最大突发数.\n
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def take(self) -> float:
+        """尝试取出一个令牌.
+        ### Result:
+        ``wait``: 还需要等待的秒数, 为0表示已经取到令牌.\n
+        """
+        now = time.monotonic()
+        self._tokens = min(self.burst,
+                           self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+
+# 优先级, 数字越小越优先
+MODERATION = 0
+REPLY = 1
+BROADCAST = 2
+PRIORITIES = (MODERATION, REPLY, BROADCAST)
+
+
+# 每个群的发送线程负责的优先级, 撤回禁言使用单独的线程,
+# 不会等待正在进行的播报请求
+WORKERS = ((MODERATION,), (REPLY, BROADCAST))
+
+
+class _GroupLane(object):
+    """一个群的发送队列, 每个优先级有独立的队列和令牌桶,
+    ``WORKERS``中的每一组优先级由一个线程发送.
+    ### Args:
+    ``grp_id``: QQ群号.\n
+    ``budgets``: 每个优先级的(每秒速率, 最大突发数).\n
+    """
+
+    def __init__(self, grp_id: int, budgets: dict):
+        self.grp_id = grp_id
+        self.queues = {priority: deque() for priority in PRIORITIES}
+        self.buckets = {priority: TokenBucket(*budgets[priority])
+                        for priority in PRIORITIES}
+        self.cond = threading.Condition()
+        self.threads = list()
+        for i, priorities in enumerate(WORKERS):
+            thread = threading.Thread(target=self._run, args=(priorities,),
+                                      name=f'dispatch-{grp_id}-{i}',
+                                      daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def _next(self, priorities: tuple):
+        """按照优先级取出下一个可以发送的任务.
+        ### Args:
+        ``priorities``: 当前线程负责的优先级.\n
+        ### Result:
+        ``item``: 可以发送的任务, 没有时为``None``.\n
+        ``wait``: 没有可以发送的任务时, 需要等待的秒数.\n
+        """
+        wait = None
+        for priority in priorities:
+            queue = self.queues[priority]
+            if not queue:
+                continue
+            bucket_wait = self.buckets[priority].take()
+            if bucket_wait == 0:
+                return queue.popleft(), 0
+            if wait is None or bucket_wait < wait:
+                wait = bucket_wait
+        return None, wait
+
+    def _run(self, priorities: tuple):
+        while True:
+            try:
+                with self.cond:
+                    item, wait = self._next(priorities)
+                    while item is None:
+                        # 队列为空时一直等待, 否则等到最近的令牌补充, 期间新任务会唤醒线程
+                        self.cond.wait(wait)
+                        item, wait = self._next(priorities)
+            except Exception as e:
+                # 线程退出之后这个群的消息会一直堆积, 所以只记录错误, 稍后重试
+                logger.error('群%s的发送线程出错: %s', self.grp_id, str(e),
+                             exc_info=True)
+                time.sleep(1)
+                continue
+            func, args, kwargs = item
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                logger.error('向群%s发送消息失败: %s', self.grp_id, str(e),
+                             exc_info=True)
+
+
+class Dispatcher(object):
+    """按群和优先级发送消息的调度器.
+    每个群有独立的发送线程, 不同的群之间并行发送,
+    同一个群内撤回禁言由单独的线程发送, 不会被进行中的播报阻塞,
+    交互回复优先于定时播报发送,
+    并且每个优先级有独立的令牌桶, 大量的播报不会占用撤回禁言的额度.
+    生产者只需要把消息放入队列, 不会被阻塞.
+    ### Args:
+    ``budgets``: 每个优先级的(每秒速率, 最大突发数).\n
+    ### Attributes:
+    ``submit``: 把一次API调用放入某个群的队列.\n
+    ``send_group_msg``: 把一条群消息放入队列.\n
+    ``depth``: 队列中等待发送的消息数.\n
+    """
+
+    def __init__(self, budgets: dict):
+        for priority in PRIORITIES:
+            rate, burst = budgets[priority]
+            if rate <= 0 or burst < 1:
+                raise ValueError(f'优先级{priority}的发送速率必须大于0, '
+                                 f'最大突发数至少为1: {rate}, {burst}')
+        self.budgets = budgets
+        self._lanes = dict()
+        self._lock = threading.Lock()
+
+    def _lane(self, grp_id: int) -> _GroupLane:
+        lane = self._lanes.get(grp_id)
+        if lane is None:
+            with self._lock:
+                lane = self._lanes.get(grp_id)
+                if lane is None:
+                    lane = _GroupLane(grp_id, self.budgets)
+                    self._lanes[grp_id] = lane
+        return lane
+
+    def submit(self, grp_id: int, func, *args,
+               priority: int = BROADCAST, **kwargs):
+        """把一次API调用放入群的发送队列.
+        ### Args:
+        ``grp_id``: QQ群号.\n
+        ``func``: 实际发送的函数, 其余参数会原样传入.\n
+        ``priority``: 优先级, ``MODERATION``, ``REPLY``或``BROADCAST``.\n
+        """
+        lane = self._lane(grp_id)
+        with lane.cond:
+            lane.queues[priority].append((func, args, kwargs))
+            lane.cond.notify_all()
+
+    def send_group_msg(self, bot, grp_id: int, message,
+                       auto_escape: bool = False,
+                       priority: int = BROADCAST):
+        """把一条群消息放入发送队列.
+        ### Args:
+        ``bot``: 用于发送消息的CQHttp.\n
+        ``grp_id``: QQ群号.\n
+        ``message``: 消息内容.\n
+        ``auto_escape``: 是否把消息内容作为纯文本发送.\n
+        ``priority``: 优先级.\n
+        """
+        self.submit(grp_id, bot.send_group_msg, group_id=grp_id,
+                    message=message, auto_escape=auto_escape,
+                    priority=priority)
+
+    def depth(self, grp_id: int = None) -> int:
+        """队列中等待发送的消息数.
+        ### Args:
+        ``grp_id``: QQ群号, 不填则返回全部群的总数.\n
+        """
+        if grp_id is not None:
+            lane = self._lanes.get(grp_id)
+            return lane.depth() if lane is not None else 0
+        return sum(lane.depth() for lane in list(self._lanes.values()))
@@ -0,0 +1,108 @@
+import time
+import threading
+from collections import Counter, OrderedDict, deque
+
+REPEAT = 'repeat'
+RATE = 'rate'
+
+
+class _UserWindow(object):
+    """一个成员在时间窗口内的发言记录.
+    ``records``保存(时间, 消息哈希), ``counter``统计每个哈希出现的次数.
+    """
+    __slots__ = ('records', 'counter', 'last_seen')
+
+    def __init__(self):
+        self.records = deque()
+        self.counter = Counter()
+        self.last_seen = 0.0
+
+    def pop(self):
+        """移除最早的一条记录."""
+        _, digest = self.records.popleft()
+        self.counter[digest] -= 1
+        if not self.counter[digest]:
+            del self.counter[digest]
+
+
+class FloodDetector(object):
+    """按照(群号, 成员)统计滑动窗口内发言的刷屏检测器.
+    每个成员最多保存``max(repeat_limit, rate_limit)``条记录,
+    超过``window``秒没有发言的成员以及超过``max_users``的最久未发言成员会被移除,
+    所以内存占用有上限, 每条消息的处理时间是常数.
+    ### Args:
+    ``window``: 滑动窗口的长度, 单位是秒.\n
+    ``repeat_limit``: 窗口内同一条消息出现多少次判定为重复刷屏, 为0表示不检测.\n
+    ``rate_limit``: 窗口内发言多少次判定为发言过快, 为0表示不检测.\n
+    ``max_users``: 最多同时记录的成员数.\n
+    ### Attributes:
+    ``check``: 记录一条消息并返回是否刷屏.\n
+    """
+
+    def __init__(self, window: float, repeat_limit: int, rate_limit: int,
+                 max_users: int = 10000):
+        self.window = window
+        self.repeat_limit = repeat_limit
+        self.rate_limit = rate_limit
+        self.max_users = max_users
+        self._size = max(repeat_limit, rate_limit)
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def _evict(self, now: float):
+        """移除长时间没有发言或者超出数量上限的成员."""
+        users = self._users
+        while users:
+            key = next(iter(users))
+            if (len(users) <= self.max_users
+                    and users[key].last_seen >= now - self.window):
+                break
+            users.popitem(last=False)
+
+    def check(self, grp_id: int, user_id: int, message: str,
+              now: float = None) -> str:
+        """记录一条消息, 并判断该成员是否在刷屏.
+        ### Args:
+        ``grp_id``: QQ群号.\n
+        ``user_id``: 成员的QQ号.\n
+        ``message``: 消息内容.\n
+        ``now``: 发言时间, 不填则为当前时间.\n
+        ### Result:
+        ``reason``: ``REPEAT``表示重复发言, ``RATE``表示发言过快, 没有刷屏时为``None``.\n
+        """
+        if not self._size:
+            # 两种检测都关闭时不需要记录
+            return None
+        if now is None:
+            now = time.time()
+        key = (grp_id, user_id)
+        digest = hash(message)
+        with self._lock:
+            user = self._users.get(key)
+            if user is None:
+                user = _UserWindow()
+                self._users[key] = user
+            else:
+                self._users.move_to_end(key)
+            user.last_seen = now
+            records = user.records
+            while records and records[0][0] < now - self.window:
+                user.pop()
+            if len(records) >= self._size:
+                user.pop()
+            records.append((now, digest))
+            user.counter[digest] += 1
+            if self.repeat_limit and user.counter[digest] >= self.repeat_limit:
+                reason = REPEAT
+            elif self.rate_limit and len(records) >= self.rate_limit:
+                reason = RATE
+            else:
+                reason = None
+            if reason is not None:
+                # 已经处理过的记录不再重复计算
+                del self._users[key]
+            self._evict(now)
+        return reason
@@ -1,19 +1,41 @@
 import logging
 import math
 import random
+import threading
 import time
-from typing import List
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor
+from concurrent.futures import wait
+from typing import List, Tuple
 
+from sqlalchemy import event, inspect
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.orm.session import Session
 
 from . import setting
+from .adaptive import AdaptiveInterval
+from .cardpool import get_card_pool
 from .modian import ModianProject, find_new_modian_project
-from .module import Project, Order, Rank, User, Card, Card_Order, Card_User
+from .module import Project, Order, User, Card_Order, Card_User
+from .module import Outbox
 from .owhat import OwhatProject
+from .rank import get_rank_index
+from .template import TemplateSet, templates
 from .taoba import TaobaProject, find_new_taoba_project
 
 logger = logging.getLogger('QQBot')
+# (平台, 项目id) -> 项目的轮询间隔
+_project_intervals = dict()
+# 汇总信息中列出的集资用户数
+DIGEST_TOP = 5
+# 刷新项目信息时从网络上更新的字段
+REFRESH_FIELDS = ('title', 'start_time', 'end_time', 'amount',
+                  'order_num', 'other_info')
+# 并行刷新项目信息的线程池, 第一次使用时创建
+_refresh_pool = None
+# (平台, 项目id) -> 尚未结束的刷新任务
+_refreshing = dict()
+_refreshing_lock = threading.Lock()
 
 
 def project_factory(project: Project) -> Project:
@@ -33,6 +55,103 @@ def project_factory(project: Project) -> Project:
                             project.amount, project.order_num)
 
 
+def _get_refresh_pool() -> ThreadPoolExecutor:
+    """返回刷新项目信息使用的线程池."""
+    global _refresh_pool
+    if _refresh_pool is None:
+        _refresh_pool = ThreadPoolExecutor(
+            int(setting.read_config('fund', 'refresh_workers')),
+            thread_name_prefix='refresh'
+        )
+    return _refresh_pool
+
+
+class _RefreshJob(object):
+    """一个项目的刷新任务, 超时从任务开始执行时计算."""
+
+    def __init__(self, project: Project):
+        self.project = project
+        self.key = (project.platform, project.pro_id)
+        self.copy = project_factory(project)
+        self.submitted = time.monotonic()
+        self.started = None
+        self.future = None
+
+    def run(self) -> bool:
+        self.started = time.monotonic()
+        return self.copy.refresh_detail()
+
+    def deadline(self, timeout: float) -> float:
+        """返回等待的截止时间, 排队中的任务从提交时开始计算."""
+        if self.started is None:
+            return self.submitted + timeout
+        return self.started + timeout
+
+    def finish(self, future: Future):
+        """任务结束(包括被取消)之后, 允许再次刷新这个项目."""
+        with _refreshing_lock:
+            if _refreshing.get(self.key) is self:
+                del _refreshing[self.key]
+
+
+def refresh_projects(project_list: List[Project]) -> dict:
+    """并行地从网络上刷新项目的基本信息.
+    刷新在不属于任何session的项目副本上进行, 数据库中的项目不会被其他线程修改.
+    每个项目从开始执行起最多等待``refresh_timeout``秒, 超时的刷新会继续在后台运行,
+    结束之前这个项目不会被再次提交, 所以一个平台卡住不会占满线程池.
+    ### Args:
+    ``project_list``: 需要刷新的项目列表.\n
+    ### Result:
+    ``result``: 刷新成功的项目 -> (集资金额是否发生了改变, 刷新后的项目副本).\n
+    """
+    timeout = float(setting.read_config('fund', 'refresh_timeout'))
+    pool = _get_refresh_pool()
+    pending = list()
+    with _refreshing_lock:
+        for project in project_list:
+            key = (project.platform, project.pro_id)
+            if key in _refreshing:
+                logger.warning('项目%s的上一次刷新尚未结束, 本轮跳过',
+                               project.title)
+                continue
+            job = _RefreshJob(project)
+            _refreshing[key] = job
+            pending.append(job)
+    for job in pending:
+        job.future = pool.submit(job.run)
+        job.future.add_done_callback(job.finish)
+    result = dict()
+    while pending:
+        now = time.monotonic()
+        waiting = list()
+        for job in pending:
+            if job.future.done():
+                try:
+                    result[job.project] = (bool(job.future.result()),
+                                           job.copy)
+                except Exception as e:
+                    logger.error('刷新项目%s失败: %s', job.project.title,
+                                 str(e), exc_info=True)
+            elif now < job.deadline(timeout):
+                waiting.append(job)
+            elif job.started is not None:
+                logger.warning('刷新项目%s超过%d秒, 本轮跳过',
+                               job.project.title, timeout)
+            elif job.future.cancel():
+                logger.warning('刷新项目%s排队超过%d秒, 本轮跳过',
+                               job.project.title, timeout)
+            else:
+                # 取消时恰好开始执行, 重新计算截止时间
+                waiting.append(job)
+        pending = waiting
+        if pending:
+            next_deadline = min(job.deadline(timeout) for job in pending)
+            wait([job.future for job in pending],
+                 timeout=max(next_deadline - time.monotonic(), 0),
+                 return_when=FIRST_COMPLETED)
+    return result
+
+
 def find_new_project(session: Session):
     """根据设定的应援会账户ID, 查找该应援会发布的新项目
     ### Args:
@@ -66,6 +185,130 @@ def get_preparing_project(session: Session) -> List[Project]:
     return session.query(Project).filter(Project.start_time > currentTime)
 
 
+# 集资项目列表的缓存, 保存(失效时间, 回复信息)
+_project_list_cache = None
+# 每次失效都会增加, 防止构建过程中发生的变化被旧结果覆盖
+_project_list_generation = 0
+_project_list_lock = threading.Lock()
+
+
+def invalidate_project_list():
+    """清除集资项目列表的缓存."""
+    global _project_list_cache, _project_list_generation
+    with _project_list_lock:
+        _project_list_cache = None
+        _project_list_generation += 1
+
+
+def get_project_list_message(session: Session) -> str:
+    """返回集资项目列表的回复信息, 项目表没有变化时直接使用缓存.
+    ### Args:
+    ``session``: 用于连接数据库的SQLAlchemy线程.\n
+    ### Result:
+    ``message``: 正在进行和尚未开始的集资项目列表.\n
+    """
+    global _project_list_cache
+    now = time.time()
+    with _project_list_lock:
+        cached = _project_list_cache
+        generation = _project_list_generation
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    message_list = list()
+    # 项目开始或者结束时列表会发生变化, 缓存在最近的一个时间点失效
+    valid_until = math.inf
+    for project in get_started_project(session):
+        message_list.append(f'{project.title}(进行中):{project.link()}')
+        valid_until = min(valid_until, project.end_time + 1)
+    for project in get_preparing_project(session):
+        message_list.append(f'{project.title}(准备中):{project.link()}')
+        valid_until = min(valid_until, project.start_time)
+    if message_list:
+        message = '\n'.join(message_list)
+    else:
+        message = '暂时没有集资项目'
+    with _project_list_lock:
+        if generation == _project_list_generation:
+            _project_list_cache = (valid_until, message)
+    return message
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_project_change(session: Session, flush_context):
+    """记录这次事务是否修改了项目的标题或者起止时间."""
+    for obj in session.new | session.deleted:
+        if isinstance(obj, Project):
+            session.info['project_changed'] = True
+            return
+    for obj in session.dirty:
+        if isinstance(obj, Project):
+            attrs = inspect(obj).attrs
+            if (attrs.title.history.has_changes()
+                    or attrs.start_time.history.has_changes()
+                    or attrs.end_time.history.has_changes()):
+                session.info['project_changed'] = True
+                return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session: Session):
+    """项目表的修改提交之后清除项目列表的缓存."""
+    if session.info.pop('project_changed', False):
+        invalidate_project_list()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session: Session):
+    """事务回滚时丢弃修改记录."""
+    session.info.pop('project_changed', None)
+
+
+def add_outbox(session: Session, message_list: List[str]) -> List[tuple]:
+    """把待发送的信息写入发件箱, 需要和订单在同一个事务中提交.
+    ### Args:
+    ``session``: 用于连接数据库的SQLAlchemy线程.\n
+    ``message_list``: 需要发送的信息列表.\n
+    ### Result:
+    ``outbox_list``: (发件箱id, 信息)的列表.\n
+    """
+    create_time = int(time.time())
+    outbox_list = [Outbox(message, create_time) for message in message_list]
+    session.add_all(outbox_list)
+    session.flush()
+    return [(outbox.id, outbox.message) for outbox in outbox_list]
+
+
+def get_outbox(session: Session) -> List[tuple]:
+    """返回发件箱中尚未发送完成的信息, 按照写入的顺序排列.
+    ### Args:
+    ``session``: 用于连接数据库的SQLAlchemy线程.\n
+    ### Result:
+    ``outbox_list``: (发件箱id, 信息)的列表.\n
+    """
+    return session.query(Outbox.id, Outbox.message).order_by(Outbox.id).all()
+
+
+def expire_outbox(session: Session, max_age: int) -> int:
+    """删除发件箱中超过一定时间仍未发送完成的信息.
+    ### Args:
+    ``session``: 用于连接数据库的SQLAlchemy线程.\n
+    ``max_age``: 信息最长保留的秒数.\n
+    ### Result:
+    ``count``: 删除的信息数量.\n
+    """
+    return session.query(Outbox).\
+        filter(Outbox.create_time < int(time.time()) - max_age).delete()
+
+
+def remove_outbox(session: Session, outbox_id: int):
+    """从发件箱中删除已经发送完成的信息.
+    ### Args:
+    ``session``: 用于连接数据库的SQLAlchemy线程.\n
+    ``outbox_id``: 发件箱id.\n
+    """
+    session.query(Outbox).filter(Outbox.id == outbox_id).delete()
+
+
 def find_user(session: Session, platform: int,
               user_id: int, nickname: str = '') -> User:
     """平台查找用户, 暂不支持o-what
@@ -109,11 +352,26 @@ def draw_card(session: Session, order: Order) -> str:
     ### Result:
     ``message``: 抽卡后的反馈信息.\n
     """
+    return _draw_card(session, order)[1]
+
+
+def _draw_card(session: Session, order: Order,
+               template_set: TemplateSet = None) -> Tuple[str, str]:
+    """根据给定的订单随机抽取一张卡片.
+    ### Args:
+    ``session``: 用于连接数据库的SQLAlchemy线程.\n
+    ``order``: 待抽卡的订单.\n
+    ``template_set``: 使用的模版, 不填则使用当前配置.\n
+    ### Result:
+    ``rarity``: 抽到的卡牌稀有度的名称.\n
+    ``message``: 抽卡后的反馈信息.\n
+    """
     if not hasattr(order, 'nickname'):
         order.nickname = ''
+    if template_set is None:
+        template_set = templates()
     # 抽取卡牌
-    threshold = float(setting.read_config('card', 'threshold'))
-    divend = order.amount / threshold
+    divend = order.amount / template_set.card_threshold
     rand = abs(random.normalvariate(0, math.sqrt(divend)))
     if divend > 25:
         rand += math.log2(divend/25)
@@ -124,8 +382,8 @@ def draw_card(session: Session, order: Order) -> str:
     elif rand > 5:
         rand = 3
     rarity = int(rand)
-    card_query = session.query(Card).filter(Card.rarity == rarity)
-    card = card_query[random.randint(0, card_query.count()-1)]
+    card_pool = get_card_pool(session)
+    card = card_pool.pick(rarity)
     # 按订单插入记录
     session.add(Card_Order(
         order_id=order.id,
@@ -147,22 +405,71 @@ def draw_card(session: Session, order: Order) -> str:
         filter(Card_User.rarity == rarity).count()
     info_dict = {
         'nickname': order.nickname,
-        'rarity': setting.rarity()[card.rarity],
+        'rarity': template_set.rarity[card.rarity],
         'name': card.name,
         'context': card.context,
         'user_amount': collected_cards,
-        'total_amount': card_query.count(),
+        'total_amount': card_pool.size(rarity),
         'image': f'[CQ:image,file={card.file_name}]',
     }
     logger.debug('%s抽取到一张%s卡:%s', user.nickname,
                  info_dict['rarity'], card.name)
-    pattern = setting.read_config('card', 'pattern')
-    return pattern.format(**info_dict)
+    return info_dict['rarity'], template_set.card.render(info_dict)
 
 
 # TODO:增加单笔订单抽取多张卡牌
 
 
+def _format_time_to_end(end_time: int) -> str:
+    """格式化项目的剩余时间."""
+    time_dist = float(end_time) - time.time()
+    if time_dist >= 86400:
+        return f'{int(time_dist / 86400)}天'
+    if time_dist > 0:
+        return f'{round((time_dist / 3600), 2)}小时'
+    return '已经结束'
+
+
+class _ProjectDigest(object):
+    """记录一个项目在本轮检查中的订单, 用于生成汇总信息."""
+
+    def __init__(self, project: Project):
+        self.project = project
+        self.order_num = 0
+        self.amount = 0.0
+        self.supporter_num = 0
+        # 平台用户id -> [昵称, 本轮集资金额]
+        self.users = dict()
+        self.cards = Counter()
+
+    def add(self, order: Order, supporter_num: int):
+        """记录一笔订单."""
+        self.order_num += 1
+        self.amount += order.amount
+        self.supporter_num = supporter_num
+        user = self.users.setdefault(order.user_id, [order.nickname, 0.0])
+        user[1] += order.amount
+
+    def build_message(self) -> str:
+        """生成本轮的汇总信息."""
+        project = self.project
+        top_users = sorted(self.users.values(),
+                           key=lambda d: d[1], reverse=True)[:DIGEST_TOP]
+        message = (f'项目{project.title}本轮收到{self.order_num}笔集资，'
+                   f'共{round(self.amount, 2)}元。\n本轮集资前{len(top_users)}名:')
+        for nickname, amount in top_users:
+            message += f'\n  {nickname}: {round(amount, 2)}元'
+        message += (f'\n本项目目前集资{project.amount}元，'
+                    f'有{self.supporter_num}人参加。')
+        if self.cards:
+            card_info = ', '.join(f'{rarity}x{num}' for rarity, num
+                                  in self.cards.most_common())
+            message += f'\n本轮抽卡: {card_info}'
+        message += (f'\n当前剩余时间：{_format_time_to_end(project.end_time)}，'
+                    f'神秘地址: {project.link()}')
+        return message
+
+
 def check_new_order(session: Session, force: bool = False) -> List[str]:
     """根据给定的订单随机抽取一张卡片.
     ### Args:
@@ -173,54 +480,63 @@ def check_new_order(session: Session, force: bool = False) -> List[str]:
     """
     project_list = get_started_project(session)
     message_list = list()
+    digest_list = list()
+    min_interval = float(setting.read_config('fund', 'interval'))
+    max_interval = float(setting.read_config('fund', 'max_interval'))
+    final_time = float(setting.read_config('fund', 'final_hours')) * 3600
+    # 模版在本轮开始时取出一次, 处理订单时不再读取配置
+    template_set = templates()
+    now = time.time()
+    due_list = list()
     for project in project_list:
-        if not project.refresh_detail():
+        interval = _project_intervals.get((project.platform, project.pro_id))
+        if interval is None:
+            interval = AdaptiveInterval(min_interval, max_interval)
+            _project_intervals[(project.platform, project.pro_id)] = interval
+        interval.set_bounds(min_interval, max_interval)
+        if force or interval.due(now):
+            due_list.append((project, interval))
+    # 网络请求并行进行, 数据库和订单的处理仍然在当前线程按顺序进行
+    refreshed = refresh_projects([project for project, _ in due_list])
+    for project, interval in due_list:
+        if project not in refreshed:
+            continue
+        now = time.time()
+        changed, copy = refreshed[project]
+        for field in REFRESH_FIELDS:
+            setattr(project, field, getattr(copy, field))
+        # 项目最后几个小时一直使用最短间隔
+        if changed or project.end_time - now <= final_time:
+            interval.hit(now)
+        else:
+            interval.miss(now)
+        if not changed:
             # 强制刷新, 用于确认遗漏的订单
             if not force:
-                logger.info('项目%s未发生更新', project.title)
+                logger.info('项目%s未发生更新, %d秒后再次检查',
+                            project.title, interval.interval)
                 continue
         session.flush()
         order_list = project.get_new_orders(session, search_all=force)
-        rank_query = session.query(Rank).\
-            filter(Rank.platform == project.platform).\
-            filter(Rank.pro_id == project.pro_id).order_by(Rank.amount.desc())
+        digest = _ProjectDigest(project)
+        digest_list.append(digest)
+        rank_index = get_rank_index(session, project.platform, project.pro_id)
         for order in order_list:
             logger.debug('处理订单:%s', str(order))
-            # 获取并修正排名信息
-            try:
-                rank = rank_query.filter(Rank.user_id == order.user_id).one()
-                rank.amount += order.amount
-                session.flush()
-            # 没有找到排名信息
-            except NoResultFound:
-                rank = Rank(
-                    platform=order.platform,
-                    pro_id=order.pro_id,
-                    user_id=order.user_id,
-                    amount=order.amount
-                )
-                session.add(rank)
-            # 生成集资播报信息
-            ranking = rank_query.filter(Rank.amount > rank.amount).count()
-            if ranking == 0:
-                amount_distance = 0
-            else:
-                amount_distance = rank_query[ranking-1]
-            support_num = rank_query.count()
-            time_dist = float(project.end_time) - time.time()
-            if time_dist >= 86400:
-                time_to_end = f'{int(time_dist / 86400)}天'
-            elif time_dist > 0:
-                time_to_end = f'{round((time_dist / 3600), 2)}小时'
-            else:
-                time_to_end = '已经结束'
+            # 修正并查询排名信息
+            user_amount = rank_index.add(order.user_id, order.amount)
+            ranking = rank_index.ranking(user_amount)
+            amount_distance = rank_index.distance(user_amount)
+            support_num = len(rank_index)
+            digest.add(order, support_num)
+            time_to_end = _format_time_to_end(project.end_time)
             average_amount = round(project.amount/support_num, 2)
             info_dict = {                                   # 可以提供的信息
                 'title': project.title,                     # 项目标题
                 'nickname': order.nickname,                 # 集资用户的昵称
                 'amount': order.amount,                     # 该笔订单的金额
-                'user_amount': rank.amount,                 # 该用户在当前项目的集资总数
-                'ranking': ranking + 1,                     # 排名
+                'user_amount': user_amount,                 # 该用户在当前项目的集资总数
+                'ranking': ranking,                         # 排名
                 'amount_distance': amount_distance,         # 和前一名的金额差距
                 'total_amount': project.amount,             # 项目总的集资额
                 'supporter_num': support_num,               # 项目当前支持的人数
@@ -228,12 +544,21 @@ def check_new_order(session: Session, force: bool = False) -> List[str]:
                 'time_to_end': time_to_end,                 # 格式化的结束时间
                 'link': project.link()                      # 项目的链接
             }
-            pattern = setting.read_config('fund', 'pattern')
-            message = pattern.format(**info_dict)
-            if order.amount < float(setting.read_config('card', 'threshold')):
+            message = template_set.fund.render(info_dict)
+            if order.amount < template_set.card_threshold:
                 message += '\n你提供的能量尚不足以推开物资库的大门, 再努把力吧！'
                 message_list.append(message)
                 continue
             message_list.append(message)
-            message_list.append(draw_card(session, order))
+            rarity, card_message = _draw_card(session, order, template_set)
+            digest.cards[rarity] += 1
+            message_list.append(card_message)
+        # 每个项目的排名在本轮结束时一次性写回
+        rank_index.flush(session)
+    # 消息过多时改为每个项目发送一条汇总信息
+    digest_threshold = int(setting.read_config('fund', 'digest_threshold'))
+    if digest_threshold and len(message_list) > digest_threshold:
+        logger.info('本轮共有%d条集资信息, 改为发送汇总信息', len(message_list))
+        return [digest.build_message() for digest in digest_list
+                if digest.order_num]
     return message_list
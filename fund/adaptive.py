@@ -0,0 +1,51 @@
+import time
+
+
+class AdaptiveInterval(object):
+    """根据数据变化情况自动调整的轮询间隔.
+    有变化时回到最短间隔, 没有变化时按照``factor``倍增, 直到最长间隔.
+    ### Args:
+    ``min_interval``: 最短间隔, 单位是秒.\n
+    ``max_interval``: 最长间隔, 单位是秒.\n
+    ``factor``: 没有变化时间隔增长的倍数.\n
+    ### Attributes:
+    ``due``: 是否到了下一次检查的时间.\n
+    ``hit``: 记录一次有变化的检查.\n
+    ``miss``: 记录一次没有变化的检查.\n
+    """
+
+    def __init__(self, min_interval: float, max_interval: float,
+                 factor: float = 2.0):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.factor = factor
+        self.interval = min_interval
+        self.next_time = 0.0
+
+    def set_bounds(self, min_interval: float, max_interval: float):
+        """更新间隔的上下限, 用于配置变化时."""
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.interval = min(max(self.interval, self.min_interval),
+                            self.max_interval)
+
+    def due(self, now: float = None) -> bool:
+        """是否到了下一次检查的时间."""
+        if now is None:
+            now = time.time()
+        # 留出一点余量, 避免因为调度误差多等一个周期
+        return now + 1 >= self.next_time
+
+    def hit(self, now: float = None):
+        """数据发生了变化, 回到最短间隔."""
+        if now is None:
+            now = time.time()
+        self.interval = self.min_interval
+        self.next_time = now + self.interval
+
+    def miss(self, now: float = None):
+        """数据没有变化, 延长间隔."""
+        if now is None:
+            now = time.time()
+        self.interval = min(self.interval * self.factor, self.max_interval)
+        self.next_time = now + self.interval
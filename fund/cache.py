@@ -0,0 +1,58 @@
+import threading
+from typing import Callable, Hashable
+
+from sqlalchemy import event
+from sqlalchemy.orm.session import Session
+
+# session.info中记录本次事务使用过的(缓存, 键)
+_INFO_KEY = 'session_caches'
+
+
+class SessionCache(object):
+    """和数据库事务绑定的进程内缓存.
+    缓存的数据在事务中会被直接修改, 所以事务提交之后才算和数据库一致,
+    事务回滚或者没有提交就关闭时, 这次事务中使用过的键会被丢弃, 下次使用时重新读取.
+    ### Attributes:
+    ``get``: 读取缓存, 没有时调用``loader``从数据库中读取.\n
+    ``drop``: 丢弃某个键, 下次使用时重新读取.\n
+    """
+
+    def __init__(self):
+        self._values = dict()
+        self._lock = threading.Lock()
+
+    def get(self, session: Session, key: Hashable, loader: Callable):
+        """读取缓存, 并把这个键登记到当前事务.
+        ### Args:
+        ``session``: 用于连接数据库的SQLAlchemy线程.\n
+        ``key``: 缓存的键.\n
+        ``loader``: 没有缓存时构建数据的函数, 没有参数.\n
+        """
+        with self._lock:
+            value = self._values.get(key)
+        if value is None:
+            value = loader()
+            with self._lock:
+                value = self._values.setdefault(key, value)
+        session.info.setdefault(_INFO_KEY, set()).add((self, key))
+        return value
+
+    def drop(self, key: Hashable):
+        """丢弃某个键, 下次使用时重新读取."""
+        with self._lock:
+            self._values.pop(key, None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _keep_after_commit(session: Session):
+    """事务提交之后缓存和数据库一致."""
+    session.info.pop(_INFO_KEY, None)
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _drop_after_rollback(session: Session, transaction):
+    """事务回滚或者没有提交就关闭时, 丢弃这次事务中使用过的缓存."""
+    if transaction.parent is not None:
+        return
+    for cache, key in session.info.pop(_INFO_KEY, ()):
+        cache.drop(key)
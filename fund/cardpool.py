@@ -0,0 +1,75 @@
+import logging
+import random
+import threading
+from collections import namedtuple
+
+from sqlalchemy.orm.session import Session
+
+from .module import Card
+
+logger = logging.getLogger('QQBot')
+# 卡牌的数据, 和数据库分离, session关闭之后也可以使用
+CardInfo = namedtuple('CardInfo',
+                      ('rarity', 'type_id', 'name', 'context', 'file_name'))
+
+
+class CardPool(object):
+    """按稀有度分组的卡牌池.
+    卡牌在项目进行期间不会变化, 所以只从``Card``表中读取一次,
+    抽卡只需要在内存中随机选择.
+    ### Args:
+    ``card_list``: 全部卡牌.\n
+    ### Attributes:
+    ``pick``: 随机抽取一张指定稀有度的卡牌.\n
+    ``size``: 指定稀有度的卡牌数量.\n
+    """
+
+    def __init__(self, card_list: list):
+        # 稀有度 -> 按type_id排列的卡牌列表
+        self._cards = dict()
+        for card in sorted(card_list, key=lambda c: (c.rarity, c.type_id)):
+            self._cards.setdefault(card.rarity, list()).append(CardInfo(
+                card.rarity, card.type_id, card.name,
+                card.context, card.file_name
+            ))
+        self._sizes = {rarity: len(cards)
+                       for rarity, cards in self._cards.items()}
+
+    def size(self, rarity: int) -> int:
+        """返回指定稀有度的卡牌数量."""
+        return self._sizes.get(rarity, 0)
+
+    def pick(self, rarity: int) -> CardInfo:
+        """随机抽取一张指定稀有度的卡牌."""
+        size = self._sizes.get(rarity, 0)
+        if not size:
+            raise ValueError(f'没有稀有度为{rarity}的卡牌')
+        return self._cards[rarity][random.randrange(size)]
+
+
+_card_pool = None
+_card_pool_lock = threading.Lock()
+
+
+def get_card_pool(session: Session) -> CardPool:
+    """返回卡牌池, 第一次使用时从数据库中读取.
+    ### Args:
+    ``session``: 用于连接数据库的SQLAlchemy线程.\n
+    """
+    global _card_pool
+    card_pool = _card_pool
+    if card_pool is None:
+        with _card_pool_lock:
+            if _card_pool is None:
+                card_list = session.query(Card).all()
+                _card_pool = CardPool(card_list)
+                logger.info('卡牌池读取完成, 共%d张卡牌', len(card_list))
+            card_pool = _card_pool
+    return card_pool
+
+
+def reload_card_pool():
+    """修改卡牌之后调用, 下次抽卡时重新从数据库中读取."""
+    global _card_pool
+    with _card_pool_lock:
+        _card_pool = None
@@ -0,0 +1,67 @@
+import contextlib
+import logging
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from . import setting
+
+logger = logging.getLogger('QQBot')
+
+
+def _db_link() -> str:
+    """返回一个适用于SQLAlchemy的数据库链接."""
+    return 'sqlite:///' + setting.read_config('system', 'database')
+
+
+def create_database_engine(link: str = None) -> Engine:
+    """建立经过调优的SQLite引擎.
+    连接使用WAL模式, 读取不会被写入阻塞, 写入时遇到锁会等待``busy_timeout``秒.
+    连接池中的连接可以在线程之间传递, 但同一时间只属于一个线程,
+    每个线程在一次任务中独占一个连接, 任务结束时归还到连接池.
+    ### Args:
+    ``link``: 数据库链接, 不填则使用配置文件中的数据库.\n
+    """
+    busy_timeout = float(setting.read_config('system', 'busy_timeout'))
+    pool_size = int(setting.read_config('system', 'db_pool'))
+    # 线程数偶尔超过连接池大小时临时建立连接, 避免等待
+    engine = create_engine(
+        link or _db_link(),
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=pool_size,
+        pool_timeout=busy_timeout,
+        connect_args={'timeout': busy_timeout, 'check_same_thread': False}
+    )
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout * 1000)}')
+        cursor.close()
+
+    return engine
+
+
+engine = create_database_engine()
+# 每个线程使用自己的session, 用完之后需要调用Session.remove()归还连接
+Session = scoped_session(sessionmaker(bind=engine))
+
+
+@contextlib.contextmanager
+def session_scope():
+    """在当前线程中使用一个session, 出错时回滚, 结束时归还连接.
+    提交需要由调用者决定, 没有提交的修改会被丢弃.
+    """
+    session = Session()
+    try:
+        yield session
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        Session.remove()
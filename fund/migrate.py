@@ -0,0 +1,131 @@
+import logging
+
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Query
+
+from . import database
+from .module import Base, Order, Rank, User
+
+logger = logging.getLogger('QQBot')
+# 版本号 -> (说明, 升级函数), 版本号保存在数据库的user_version中
+MIGRATIONS = dict()
+
+
+def migration(version: int, description: str):
+    """注册一个数据库升级函数, 升级函数在事务中执行, 需要能够重复执行.
+    ### Args:
+    ``version``: 升级之后的版本号, 从1开始依次增加.\n
+    ``description``: 升级的说明, 会写入日志.\n
+    """
+    def deco(func):
+        MIGRATIONS[version] = (description, func)
+        return func
+    return deco
+
+
+@migration(1, '为订单签名建立唯一索引')
+def _order_signature(conn: Connection):
+    # 旧版本可能因为并发写入产生重复的订单, 这些订单关联着抽卡记录和排名,
+    # 不能自动删除, 需要手动处理之后再升级
+    duplicates = conn.execute(
+        'SELECT platform, pro_id, signature, GROUP_CONCAT(id) FROM "Order" '
+        'GROUP BY platform, pro_id, signature HAVING COUNT(*) > 1'
+    ).fetchall()
+    if duplicates:
+        detail = '\n'.join(f'平台{platform} 项目{pro_id} 签名{signature}: '
+                           f'订单id {ids}'
+                           for platform, pro_id, signature, ids in duplicates)
+        raise RuntimeError(f'数据库中有{len(duplicates)}组重复的订单, '
+                           f'请手动删除多余的订单及其抽卡记录后再升级:\n{detail}')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS ix_order_signature '
+                 'ON "Order" (platform, pro_id, signature)')
+
+
+@migration(2, '为用户的平台id建立索引')
+def _user_platform_id(conn: Connection):
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_user_modian_id '
+                 'ON "User" (modian_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_user_taoba_id '
+                 'ON "User" (taoba_id)')
+
+
+@migration(3, '为项目排名建立覆盖索引')
+def _rank_amount(conn: Connection):
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_rank_amount '
+                 'ON "Rank" (platform, pro_id, amount, user_id)')
+
+
+def schema_version(conn: Connection) -> int:
+    """返回数据库当前的版本号."""
+    return conn.execute('PRAGMA user_version').scalar()
+
+
+def migrate(engine: Engine) -> int:
+    """建立缺少的表格, 并且把数据库升级到最新的版本.
+    ### Args:
+    ``engine``: 数据库的SQLAlchemy引擎.\n
+    ### Result:
+    ``version``: 升级之后的版本号.\n
+    """
+    Base.metadata.create_all(engine)
+    with engine.connect() as conn:
+        version = schema_version(conn)
+    for target in sorted(MIGRATIONS):
+        if target <= version:
+            continue
+        description, func = MIGRATIONS[target]
+        logger.info('升级数据库到版本%d: %s', target, description)
+        with engine.begin() as conn:
+            func(conn)
+            # PRAGMA不支持参数绑定, 版本号是整数可以直接拼接
+            conn.execute(f'PRAGMA user_version = {int(target)}')
+        version = target
+    return version
+
+
+def _hot_queries() -> dict:
+    """返回需要使用索引的常用查询."""
+    return {
+        '订单去重': Query(Order.id).
+        filter(Order.platform == 2).filter(Order.pro_id == 0).
+        filter(Order.signature == ''),
+        '订单签名': Query(Order.signature).
+        filter(Order.platform == 2).filter(Order.pro_id == 0),
+        '摩点用户': Query(User).filter(User.modian_id == 0),
+        '桃叭用户': Query(User).filter(User.taoba_id == 0),
+        '项目排名': Query(Rank).
+        filter(Rank.platform == 2).filter(Rank.pro_id == 0),
+    }
+
+
+def check_query_plans(engine: Engine) -> dict:
+    """用EXPLAIN QUERY PLAN检查常用查询是否使用了索引.
+    ### Args:
+    ``engine``: 数据库的SQLAlchemy引擎.\n
+    ### Result:
+    ``plans``: 查询名称 -> (是否使用了索引, 查询计划).\n
+    """
+    plans = dict()
+    with engine.connect() as conn:
+        for name, query in _hot_queries().items():
+            compiled = query.statement.compile(dialect=engine.dialect)
+            params = compiled.construct_params()
+            rows = conn.execute('EXPLAIN QUERY PLAN ' + str(compiled),
+                                [params[key] for key in compiled.positiontup])
+            details = [row[-1] for row in rows]
+            # 全表扫描的计划是"SCAN 表名", 使用索引时会注明索引
+            indexed = all('USING' in detail for detail in details
+                          if detail.startswith('SCAN')
+                          or detail.startswith('SEARCH'))
+            plans[name] = (indexed, details)
+            if not indexed:
+                logger.warning('查询%s没有使用索引: %s', name, '; '.join(details))
+    return plans
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    print(f'数据库版本: {migrate(database.engine)}')
+    for name, (indexed, details) in check_query_plans(database.engine).items():
+        print(f'{name}: {"使用索引" if indexed else "全表扫描"} - '
+              f'{"; ".join(details)}')
@@ -10,6 +10,7 @@ from sqlalchemy.orm.session import Session
 
 from . import setting
 from .module import Project, Order
+from .signature import get_signature_set
 
 
 logger = logging.getLogger('QQBot')
@@ -68,7 +69,8 @@ class ModianProject(Project):
                            'AppleWebKit/605.1.15 (KHTML, like Gecko) '
                            'Version/13.0.5 Safari/605.1.15'),
         }
-        response = requests.get(url, headers=header).text
+        response = requests.get(url, headers=header,
+                                timeout=setting.http_timeout()).text
         response = response[41:-3]
         profile = json.loads(response)
         backer_money = str(profile['backer_money'])
@@ -114,7 +116,8 @@ class ModianProject(Project):
                            'AppleWebKit/605.1.15 (KHTML, like Gecko) '
                            'Version/13.0.5 Safari/605.1.15'),
         }
-        response = requests.get(url, headers=header).text
+        response = requests.get(url, headers=header,
+                                timeout=setting.http_timeout()).text
         response = response[40: -2]
         html_data = json.loads(response)['html']
         # 获取HTML数据, 准备通过BeautifulSoup处理
@@ -189,6 +192,7 @@ class ModianProject(Project):
         ``order_list``: 一个内部为``Order``内容的list, 包括这个项目的全部订单.\n
         """
         # 根据项目ID顺序查找有没有新订单
+        signature_set = get_signature_set(session, self.platform, self.pro_id)
         order_list = list()
         cleared = False
         page = 1
@@ -196,18 +200,15 @@ class ModianProject(Project):
             order_page, cleared = self._get_order(page)
             page += 1
             for order in order_page:
-                if session.query(Order).\
-                        filter(Order.signature == order.signature).\
-                        filter(Order.pro_id == self.pro_id).\
-                        filter(Order.platform == self.platform).\
-                        count() == 0:
-                    session.add(order)
-                    session.flush()
+                if order.signature not in signature_set:
+                    signature_set.add(order.signature)
                     order_list.append(order)
                 elif not search_all:
-                    logger.info('发现项目%s的%d条新的订单数据', self.title,
-                                len(order_list))
-                    return order_list
+                    cleared = True
+                    break
+        # 新订单一次性写入数据库
+        session.add_all(order_list)
+        session.flush()
         logger.info('发现项目%s的%d条新的订单数据', self.title, len(order_list))
         return order_list
 
@@ -228,7 +229,8 @@ def find_new_modian_project(session: Session):
     }
     url = ('https://me.modian.com/user?type=index'
            f'&id={setting.read_config("modian","userid")}')
-    response_html = requests.get(url, headers=header).text
+    response_html = requests.get(url, headers=header,
+                                 timeout=setting.http_timeout()).text
     soup = BeautifulSoup(response_html, 'lxml')
     soup_pro_list = soup.find_all(name='h4', class_='prottl')
     for soup_profile in soup_pro_list:
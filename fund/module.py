@@ -1,6 +1,7 @@
 import json
 
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text
+from sqlalchemy import Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm.session import Session
 
@@ -117,6 +118,11 @@ class Order(Base):
     user_id = Column(Integer, nullable=False)
     amount = Column(Float, nullable=False)
     signature = Column(String(40), nullable=False)
+    # 新增索引时需要在fund/migrate.py中增加对应的升级函数
+    __table_args__ = (
+        Index('ix_order_signature', 'platform', 'pro_id', 'signature',
+              unique=True),
+    )
 
     def __init__(self, platform: int, pro_id: int, user_id: int,
                  nickname: int, amount: int, signature: int):
@@ -157,6 +163,9 @@ class Rank(Base):
     # 集资平台的用户ID, 不是数据库当中的用户ID
     user_id = Column(Integer, primary_key=True, nullable=False)
     amount = Column(Float, nullable=False)
+    __table_args__ = (
+        Index('ix_rank_amount', 'platform', 'pro_id', 'amount', 'user_id'),
+    )
 
     def __init__(self, platform: int, pro_id: int,
                  user_id: int, amount: float):
@@ -192,6 +201,10 @@ class User(Base):
     modian_id = Column(Integer)
     taoba_id = Column(Integer)
     owhat_id = Column(Integer)
+    __table_args__ = (
+        Index('ix_user_modian_id', 'modian_id'),
+        Index('ix_user_taoba_id', 'taoba_id'),
+    )
 
     def __init__(self, nickname: str = '', qq_id: str = '', modian_id: int = 0,
                  taoba_id: str = 0, owhat_id: str = 0):
@@ -277,3 +290,40 @@ class Card_Order(Base):
         self.order_id = order_id
         self.rarity = rarity
         self.type_id = type_id
+
+
+class State(Base):
+    """用来记录轮询游标和登录凭据等运行状态的一个类
+    ### Args:
+    ``section``: 状态所属的模块, 和conf文件中的段落对应.\n
+    ``option``: 状态的名称.\n
+    ``value``: 状态的值, 统一用字符串保存.\n
+    """
+    __tablename__ = 'State'
+    section = Column(String(50), nullable=False, primary_key=True)
+    option = Column(String(50), nullable=False, primary_key=True)
+    value = Column(String(4000))
+
+    def __init__(self, section: str, option: str, value: str = ''):
+        self.section = section
+        self.option = option
+        self.value = value
+
+
+class Outbox(Base):
+    """用来记录尚未发送完成的集资信息的一个类
+    信息和订单在同一个事务中写入, 全部群发送成功之后删除,
+    重启时只需要重新发送这里剩下的信息.
+    ### Args:
+    ``id``: 数据库自增数据, 可以不用手动设置.\n
+    ``message``: 需要发送的信息.\n
+    ``create_time``: 信息生成的时间, 用10位Unix时间戳表示.\n
+    """
+    __tablename__ = 'Outbox'
+    id = Column(Integer, autoincrement=True, primary_key=True)
+    message = Column(Text, nullable=False)
+    create_time = Column(Integer, nullable=False)
+
+    def __init__(self, message: str, create_time: int):
+        self.message = message
+        self.create_time = create_time
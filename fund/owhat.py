@@ -4,6 +4,7 @@ import requests
 import time
 from typing import List
 
+from . import setting
 from .module import Project, Rank
 
 logger = logging.getLogger('QQBot')
@@ -32,7 +33,8 @@ def send_request(cmd_s: str, cmd_m: str, data: str) -> dict:
         'data': data
     }
     url = f"https://m.owhat.cn/api?requesttimestap={int(time.time()*1000)}"
-    result = requests.post(url, params, json=True, headers=headers).json()
+    result = requests.post(url, params, json=True, headers=headers,
+                           timeout=setting.http_timeout()).json()
     if result['result'] != 'success':
         logger.error("拉取数据失败,返回报文:%s 发送命令:%s",
                      json.dumps(result), json.dumps(params))
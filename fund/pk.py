@@ -2,6 +2,8 @@
 import pickle
 import logging
 import logging.config
+import threading
+import time
 
 from . import setting
 from . import project_factory
@@ -155,8 +157,64 @@ def _get_pk_message_group_increase(cache_dict: dict,
     return message
 
 
-def get_pk_message(pk_data: dict):
-    """构建PK播报的信息.
+class _Flight(object):
+    """一次正在进行的PK信息刷新, 其他请求会等待它的结果."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.message = None
+        self.error = None
+
+
+# PK标题 -> (过期时间, PK播报信息)
+_standings = dict()
+# PK标题 -> 正在进行的刷新
+_flights = dict()
+_standings_lock = threading.Lock()
+
+
+def get_pk_message(pk_data: dict) -> str:
+    """获取PK播报的信息, 在``[pk] cache_ttl``秒内重复使用上一次的结果.
+    同一个PK同时只会有一次刷新, 其余的请求会等待这次刷新完成.
+    ### Args:
+    ``pk_data``: PK的配置信息.\n
+    ### Result:
+    ``message``: PK进展的播报信息.\n
+    """
+    title = pk_data['title']
+    ttl = setting.config.derive(
+        'pk.cache_ttl', lambda: float(setting.read_config('pk', 'cache_ttl'))
+    )
+    with _standings_lock:
+        cached = _standings.get(title)
+        if cached is not None and cached[0] > time.time():
+            return cached[1]
+        flight = _flights.get(title)
+        leader = flight is None
+        if leader:
+            flight = _Flight()
+            _flights[title] = flight
+    if not leader:
+        flight.event.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.message
+    try:
+        flight.message = build_pk_message(pk_data)
+        with _standings_lock:
+            _standings[title] = (time.time() + ttl, flight.message)
+        return flight.message
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _standings_lock:
+            del _flights[title]
+        flight.event.set()
+
+
+def build_pk_message(pk_data: dict) -> str:
+    """从各个平台刷新数据, 构建PK播报的信息.
     ### Args:
     ``pk_data``: PK的配置信息.\n
     ### Result:
@@ -0,0 +1,107 @@
+import bisect
+
+from sqlalchemy.orm.session import Session
+
+from .cache import SessionCache
+from .module import Rank
+
+# (平台, 项目id) -> 项目的排名索引
+_rank_indexes = SessionCache()
+
+
+class RankIndex(object):
+    """一个项目的集资排名索引.
+    从``Rank``表中读取一次之后在内存中维护, 按金额排序,
+    排名, 与前一名的差距和支持人数都可以用二分查找得到.
+    修改过的用户会被记录下来, 之后一次性写回数据库.
+    ### Args:
+    ``platform``: 集资平台.\n
+    ``pro_id``: 项目在集资平台上的id.\n
+    ``rank_list``: 数据库中已有的排名.\n
+    ### Attributes:
+    ``add``: 记录一笔订单, 返回该用户的集资总额.\n
+    ``ranking``: 某个金额的排名.\n
+    ``distance``: 某个金额和前一名的差距.\n
+    ``flush``: 把修改过的排名写回数据库.\n
+    """
+
+    def __init__(self, platform: int, pro_id: int, rank_list: list):
+        self.platform = platform
+        self.pro_id = pro_id
+        # 平台用户id -> 集资总额
+        self._amounts = {rank.user_id: rank.amount for rank in rank_list}
+        # 从低到高排列的集资总额
+        self._sorted = sorted(self._amounts.values())
+        self._dirty = set()
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    def add(self, user_id: int, amount: float) -> float:
+        """记录一笔订单.
+        ### Args:
+        ``user_id``: 平台上的用户id.\n
+        ``amount``: 订单金额.\n
+        ### Result:
+        ``user_amount``: 该用户在当前项目的集资总额.\n
+        """
+        old_amount = self._amounts.get(user_id)
+        if old_amount is None:
+            user_amount = amount
+        else:
+            user_amount = old_amount + amount
+            del self._sorted[bisect.bisect_left(self._sorted, old_amount)]
+        bisect.insort(self._sorted, user_amount)
+        self._amounts[user_id] = user_amount
+        self._dirty.add(user_id)
+        return user_amount
+
+    def ranking(self, amount: float) -> int:
+        """返回某个集资总额的排名, 金额相同时排名相同."""
+        higher = len(self._sorted) - bisect.bisect_right(self._sorted, amount)
+        return higher + 1
+
+    def distance(self, amount: float) -> float:
+        """返回某个集资总额和前一名的差距, 第一名为0."""
+        i = bisect.bisect_right(self._sorted, amount)
+        if i == len(self._sorted):
+            return 0
+        return round(self._sorted[i] - amount, 2)
+
+    def flush(self, session: Session):
+        """把修改过的排名写回数据库, 需要和订单在同一个事务中提交.
+        ### Args:
+        ``session``: 用于连接数据库的SQLAlchemy线程.\n
+        """
+        if not self._dirty:
+            return
+        dirty = self._dirty
+        self._dirty = set()
+        existing = session.query(Rank).\
+            filter(Rank.platform == self.platform).\
+            filter(Rank.pro_id == self.pro_id).\
+            filter(Rank.user_id.in_(dirty)).all()
+        for rank in existing:
+            rank.amount = self._amounts[rank.user_id]
+            dirty.discard(rank.user_id)
+        session.add_all([Rank(self.platform, self.pro_id,
+                              user_id, self._amounts[user_id])
+                         for user_id in dirty])
+        session.flush()
+
+
+def get_rank_index(session: Session, platform: int,
+                   pro_id: int) -> RankIndex:
+    """返回项目的排名索引, 第一次使用时从数据库中读取.
+    ### Args:
+    ``session``: 用于连接数据库的SQLAlchemy线程.\n
+    ``platform``: 集资平台.\n
+    ``pro_id``: 项目在集资平台上的id.\n
+    """
+    def load() -> RankIndex:
+        rank_list = session.query(Rank).\
+            filter(Rank.platform == platform).\
+            filter(Rank.pro_id == pro_id).all()
+        return RankIndex(platform, pro_id, rank_list)
+    # 事务回滚时内存中的索引会和数据库不一致, 需要丢弃
+    return _rank_indexes.get(session, (platform, pro_id), load)
@@ -1,10 +1,139 @@
 import os
 import configparser
+import threading
+from typing import Callable
 
 cfg_name = '../setting.conf'
 BASE_DIR = os.path.dirname(__file__)
-FILE_PATH = os.path.join(BASE_DIR, cfg_name)
-cf = configparser.ConfigParser()
+FILE_PATH = os.path.abspath(os.path.join(BASE_DIR, cfg_name))
+
+
+class ConfigCache(object):
+    """进程内共享的配置文件缓存.
+    只有当文件的修改时间或大小发生变化时才会重新解析,
+    由配置值派生出的数据(列表, 集合, 浮点数等)在每次重新加载后只计算一次.
+    ### Args:
+    ``path``: 配置文件的路径.\n
+    ### Attributes:
+    ``get``: 读取指定的配置值.\n
+    ``derive``: 读取由配置派生出的缓存数据.\n
+    ``invalidate``: 强制在下一次读取时重新加载.\n
+    ``version``: 配置被重新加载的次数, 可以用来判断派生数据是否需要重建.\n
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.version = 0
+        self._lock = threading.RLock()
+        self._stamp = None
+        self._parser = configparser.ConfigParser()
+        self._derived = dict()
+
+    def _refresh(self):
+        """检查文件状态, 在文件变化时重新解析."""
+        stat = os.stat(self.path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            parser = configparser.ConfigParser()
+            with open(self.path, 'r', encoding='utf-8') as cfgfile:
+                parser.read_file(cfgfile)
+            self._parser = parser
+            self._derived = dict()
+            self._stamp = stamp
+            self.version += 1
+
+    def get(self, section: str, option: str) -> str:
+        """读取指定的配置值.
+        ### Args:
+        ``section``: 在conf文件中的段落.\n
+        ``option``: 在conf文件中的选项.\n
+        """
+        self._refresh()
+        return str(self._parser.get(section, option))
+
+    def derive(self, key: str, builder: Callable):
+        """读取由配置派生出的数据, 每次重新加载后只调用一次``builder``.
+        ### Args:
+        ``key``: 派生数据的名称.\n
+        ``builder``: 构建数据的函数, 没有参数.\n
+        """
+        self._refresh()
+        derived = self._derived
+        if key not in derived:
+            with self._lock:
+                if key not in self._derived:
+                    self._derived[key] = builder()
+                derived = self._derived
+        return derived[key]
+
+    def invalidate(self):
+        """清除缓存, 下一次读取时会重新解析文件."""
+        with self._lock:
+            self._stamp = None
+
+    def write(self, section: str, option: str, value: str):
+        """把配置值写回文件, 写入过程先写临时文件再替换, 避免写到一半时损坏配置.
+        ### Args:
+        ``section``: 在conf文件中的段落.\n
+        ``option``: 在conf文件中的选项.\n
+        ``value``: 需要写入的值.\n
+        """
+        with self._lock:
+            parser = configparser.ConfigParser()
+            with open(self.path, 'r', encoding='utf-8') as cfgfile:
+                parser.read_file(cfgfile)
+            parser.set(section, option, value)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as cfgfile:
+                parser.write(cfgfile)
+            os.replace(tmp_path, self.path)
+            self._stamp = None
+
+
+class WatchedFile(object):
+    """文件内容的缓存, 只有文件的修改时间或大小变化时才会重新加载.
+    ### Args:
+    ``path``: 文件的路径.\n
+    ``loader``: 读取文件的函数, 参数是文件路径, 返回值会被缓存.\n
+    """
+
+    def __init__(self, path: str, loader: Callable):
+        self.path = path
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._value = None
+
+    def get(self):
+        """返回文件内容, 文件变化时重新加载."""
+        stat = os.stat(self.path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self._value = self._loader(self.path)
+                    self._stamp = stamp
+        return self._value
+
+
+_caches = dict()
+_caches_lock = threading.Lock()
+
+
+def config_cache(path: str) -> ConfigCache:
+    """返回指定路径对应的配置缓存, 同一个文件在进程内只会有一个缓存."""
+    path = os.path.abspath(path)
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = ConfigCache(path)
+        return _caches[path]
+
+
+config = config_cache(FILE_PATH)
 
 
 def read_config(section: str, option: str) -> str:
@@ -15,10 +144,7 @@ def read_config(section: str, option: str) -> str:
     ### Result:
     ``result``: 所读取到的配置值.
     """
-    with open(FILE_PATH, 'r', encoding='utf-8') as cfgfile:
-        cf.read_file(cfgfile)
-        result = cf.get(section, option)
-    return str(result)
+    return config.get(section, option)
 
 
 def write_config(section: str, option: str, value: str) -> str:
@@ -27,15 +153,26 @@ def write_config(section: str, option: str, value: str) -> str:
     ``section``: 在conf文件中的段落.\n
     ``option``: 在conf文件中的选项.\n
     """
-    with open(FILE_PATH, 'r', encoding='utf-8') as cfgfile:
-        cf.read_file(cfgfile)
-        with open(FILE_PATH, 'w+', encoding='utf-8') as cfgfile2:
-            cf.set(section, option, value)
-            cf.write(cfgfile2)
+    config.write(section, option, value)
 
 
 def rarity() -> list:
     """返回卡牌稀有度的名称."""
-    rarity = read_config('card', 'rarity')
-    rarity_list = rarity.split(',')
-    return rarity_list
+    return config.derive(
+        'card.rarity', lambda: read_config('card', 'rarity').split(',')
+    )
+
+
+def card_threshold() -> float:
+    """返回抽卡的金额阈值."""
+    return config.derive(
+        'card.threshold', lambda: float(read_config('card', 'threshold'))
+    )
+
+
+def http_timeout() -> tuple:
+    """返回访问集资平台的(连接超时, 读取超时), 单位是秒."""
+    return config.derive(
+        'fund.http_timeout',
+        lambda: (3, float(read_config('fund', 'http_timeout')))
+    )
@@ -0,0 +1,26 @@
+from sqlalchemy.orm.session import Session
+
+from .cache import SessionCache
+from .module import Order
+
+# (平台, 项目id) -> 项目已有订单的签名集合
+_signature_sets = SessionCache()
+
+
+def get_signature_set(session: Session, platform: int, pro_id: int) -> set:
+    """返回项目已有订单的签名集合, 第一次使用时从数据库中读取.
+    新订单的签名需要由调用者加入集合, 并且和订单在同一个事务中提交.
+    ### Args:
+    ``session``: 用于连接数据库的SQLAlchemy线程.\n
+    ``platform``: 集资平台.\n
+    ``pro_id``: 项目在集资平台上的id.\n
+    ### Result:
+    ``signature_set``: 订单签名的集合.\n
+    """
+    def load() -> set:
+        return {signature for signature, in
+                session.query(Order.signature).
+                filter(Order.platform == platform).
+                filter(Order.pro_id == pro_id)}
+    # 事务回滚时集合中会多出没有写入数据库的签名, 需要丢弃
+    return _signature_sets.get(session, (platform, pro_id), load)
@@ -0,0 +1,140 @@
+import atexit
+import configparser
+import logging
+import threading
+
+from sqlalchemy import select
+
+from . import setting
+from .database import engine
+from .module import State
+
+logger = logging.getLogger('QQBot')
+
+
+class StateStore(object):
+    """保存轮询游标和登录凭据的状态存储.
+    读取全部在内存中完成, 写入会先记录在内存里,
+    经过``delay``秒后在一个事务中批量写回数据库, 期间的多次写入会被合并.
+    ### Args:
+    ``delay``: 合并写入的等待时间, 单位是秒.\n
+    ### Attributes:
+    ``get``: 读取状态, 数据库中没有时回退到conf文件中的旧值.\n
+    ``set``: 写入状态.\n
+    ``flush``: 立即把未写入的状态写回数据库.\n
+    """
+
+    def __init__(self, delay: float = 5.0):
+        self.delay = delay
+        self._lock = threading.RLock()
+        self._engine = None
+        self._values = None
+        self._dirty = dict()
+        self._timer = None
+
+    def _load(self):
+        """首次使用时建立连接并把全部状态读入内存."""
+        if self._values is not None:
+            return
+        with self._lock:
+            if self._values is not None:
+                return
+            self._engine = engine
+            State.__table__.create(self._engine, checkfirst=True)
+            table = State.__table__
+            with self._engine.connect() as conn:
+                rows = conn.execute(
+                    select([table.c.section, table.c.option, table.c.value])
+                ).fetchall()
+            self._values = {(row[0], row[1]): row[2] for row in rows}
+
+    def get(self, section: str, option: str) -> str:
+        """读取状态.
+        ### Args:
+        ``section``: 状态所属的模块.\n
+        ``option``: 状态的名称.\n
+        ### Result:
+        ``value``: 状态的值.\n
+        """
+        self._load()
+        value = self._values.get((section, option))
+        if value is None:
+            # 兼容旧版本, 之前的状态保存在conf文件中
+            try:
+                value = setting.read_config(section, option)
+            except (configparser.NoSectionError, configparser.NoOptionError):
+                value = ''
+            with self._lock:
+                self._values.setdefault((section, option), value)
+        return value
+
+    def set(self, section: str, option: str, value: str):
+        """写入状态, 实际的数据库写入会延迟合并.
+        ### Args:
+        ``section``: 状态所属的模块.\n
+        ``option``: 状态的名称.\n
+        ``value``: 需要写入的值.\n
+        """
+        self._load()
+        with self._lock:
+            self._values[(section, option)] = value
+            self._dirty[(section, option)] = value
+            self._schedule()
+
+    def _schedule(self):
+        """安排一次延迟写入, 已经安排过时不重复安排."""
+        if self._timer is None:
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """把未写入的状态在一个事务中写回数据库."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            dirty = self._dirty
+            self._dirty = dict()
+            try:
+                with self._engine.begin() as conn:
+                    conn.execute(
+                        State.__table__.insert().prefix_with('OR REPLACE'),
+                        [{'section': key[0], 'option': key[1], 'value': value}
+                         for key, value in dirty.items()]
+                    )
+            except Exception as e:
+                # 写入失败时保留脏数据, 等待下一次写入
+                for key, value in dirty.items():
+                    self._dirty.setdefault(key, value)
+                logger.error('状态写入失败: %s', str(e), exc_info=True)
+                self._schedule()
+                return
+        logger.debug('写入了%d条状态数据', len(dirty))
+
+
+store = StateStore()
+atexit.register(store.flush)
+
+
+def read_state(section: str, option: str) -> str:
+    """读取指定的运行状态.
+    ### Args:
+    ``section``: 状态所属的模块.\n
+    ``option``: 状态的名称.\n
+    ### Result:
+    ``result``: 所读取到的状态值.
+    """
+    return store.get(section, option)
+
+
+def write_state(section: str, option: str, value: str):
+    """写入指定的运行状态.
+    ### Args:
+    ``section``: 状态所属的模块.\n
+    ``option``: 状态的名称.\n
+    ``value``: 需要写入的值.\n
+    """
+    store.set(section, option, value)
@@ -10,7 +10,9 @@ import zlib
 from sqlalchemy.orm.session import Session
 
 from . import setting
+from .state import read_state, write_state
 from .module import Project, Rank, Order
+from .signature import get_signature_set
 
 logger = logging.getLogger('QQBot')
 
@@ -82,7 +84,7 @@ def send_request(url: str, data: str) -> dict:
     """
     headers = {
         'Content-Type': 'application/json',
-        'SIGNATURE': setting.read_config('taoba', 'signature'),
+        'SIGNATURE': read_state('taoba', 'signature'),
         'Origin': 'https://www.tao-ba.club',
         'Cookie': 'l10n=zh-cn',
         'Accept-Language': 'zh-cn',
@@ -95,7 +97,8 @@ def send_request(url: str, data: str) -> dict:
         'Connection': 'keep-alive'
     }
     data = encode(data)
-    response = requests.post(url=url, data=data, headers=headers)
+    response = requests.post(url=url, data=data, headers=headers,
+                             timeout=setting.http_timeout())
     return decode(response.text)
 
 
@@ -117,7 +120,7 @@ def get_signature():
     )
     response = send_request('https://www.tao-ba.club/signin/phone', data)
     if response['code'] == 0:
-        setting.write_config('taoba', 'signature', response['token'])
+        write_state('taoba', 'signature', response['token'])
     else:
         logger.error('桃叭登录失败, 请检查用户名和密码')
 
@@ -279,15 +282,15 @@ class TaobaProject(Project):
         ``order_list``: 一个内部为``Order``内容的list, 包括这个项目的全部订单.\n
         """
         total_order_list = self.get_orders()
+        signature_set = get_signature_set(session, 2, self.pro_id)
         new_order_list = list()
         for order in total_order_list:
-            if session.query(Order).\
-                       filter(Order.signature == order.signature).\
-                       filter(Order.pro_id == self.pro_id).\
-                       filter(Order.platform == 2).count() == 0:
-                session.add(order)
-                session.flush()
+            if order.signature not in signature_set:
+                signature_set.add(order.signature)
                 new_order_list.append(order)
+        # 新订单一次性写入数据库
+        session.add_all(new_order_list)
+        session.flush()
         logger.info('发现项目%s的%d条新的订单数据', self.title, len(new_order_list))
         return new_order_list
 
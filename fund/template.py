@@ -0,0 +1,80 @@
+import re
+import string
+
+from . import setting
+
+# 集资播报模版中可以使用的信息
+FUND_FIELDS = frozenset((
+    'title', 'nickname', 'amount', 'user_amount', 'ranking',
+    'amount_distance', 'total_amount', 'supporter_num', 'average_amount',
+    'time_to_end', 'link',
+))
+# 抽卡信息模版中可以使用的信息
+CARD_FIELDS = frozenset((
+    'nickname', 'rarity', 'name', 'context', 'user_amount', 'total_amount',
+    'image',
+))
+
+
+class Template(object):
+    """经过检查的信息模版.
+    读取配置时检查模版中的占位符, 有未知的占位符或者括号不匹配时立即报错,
+    不会等到播报的时候才发现.
+    ### Args:
+    ``name``: 模版的名称, 用于错误信息.\n
+    ``pattern``: 模版的内容, 使用``str.format``的格式.\n
+    ``fields``: 模版中可以使用的占位符.\n
+    ### Attributes:
+    ``render``: 用给定的信息生成文字.\n
+    """
+
+    def __init__(self, name: str, pattern: str, fields: frozenset):
+        self.name = name
+        self.pattern = pattern
+        unknown = list()
+        try:
+            parsed = list(string.Formatter().parse(pattern))
+        except ValueError as e:
+            raise ValueError(f'模版{name}的格式错误: {e}') from None
+        for _, field, _, _ in parsed:
+            if field is None:
+                continue
+            root = re.split(r'[.\[]', field, 1)[0]
+            if root not in fields:
+                unknown.append(field or '{}')
+        if unknown:
+            raise ValueError(f'模版{name}中有未知的占位符: {", ".join(unknown)}, '
+                             f'可以使用的有: {", ".join(sorted(fields))}')
+        self._format = pattern.format_map
+
+    def render(self, info: dict) -> str:
+        """用给定的信息生成文字.
+        ### Args:
+        ``info``: 占位符 -> 值.\n
+        """
+        return self._format(info)
+
+
+class TemplateSet(object):
+    """一次配置加载后集资和抽卡使用的模版和参数.
+    ### Attributes:
+    ``fund``: 集资播报的模版.\n
+    ``card``: 抽卡信息的模版.\n
+    ``card_threshold``: 抽卡的金额阈值.\n
+    ``rarity``: 卡牌稀有度的名称.\n
+    """
+
+    def __init__(self):
+        self.fund = Template('fund.pattern',
+                             setting.read_config('fund', 'pattern'),
+                             FUND_FIELDS)
+        self.card = Template('card.pattern',
+                             setting.read_config('card', 'pattern'),
+                             CARD_FIELDS)
+        self.card_threshold = setting.card_threshold()
+        self.rarity = setting.rarity()
+
+
+def templates() -> TemplateSet:
+    """返回当前配置对应的模版, 配置文件变化后才会重新编译."""
+    return setting.config.derive('templates', TemplateSet)
@@ -1,15 +1,13 @@
 import os
 
-from sqlalchemy import create_engine
-
-from fund.module import Base
+from fund.database import engine
+from fund.migrate import migrate
 import pocket48
 import setting
 
 # 初始化数据库
 print("建立数据库表格...")
-engine = create_engine(setting.db_link())
-Base.metadata.create_all(engine)
+migrate(engine)
 print("完成!")
 
 # 建立PK配置和缓存的文件夹
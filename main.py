@@ -1,41 +1,169 @@
+import functools
+import json
+import threading
 import time
 import logging
 import logging.config
 
-from cqhttp import CQHttp
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.background import BackgroundScheduler
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
+import flood
 import fund
 import fund.pk
 import pocket48
 import setting
 import weibo
+from cqapi import PooledCQHttp
+from dispatcher import Dispatcher, MODERATION, REPLY, BROADCAST
+from fund.adaptive import AdaptiveInterval
+from fund.cardpool import reload_card_pool
+from fund.database import engine, session_scope
+from fund.migrate import migrate
+from fund.template import templates
+from monitor import JobMonitor
+from router import CommandRouter
+from workers import BoundedExecutor
 
 logger = logging.getLogger('QQBot')
-bot = CQHttp(api_root='http://127.0.0.1:5700/')
-sched = BackgroundScheduler()
-engine = create_engine(setting.db_link())
-global pk_mission_started
-global repeat_message
-# 列表中保存的是已经完成初始化的PK项目
-pk_mission_started = list()
-# 重复刷屏禁言的准备
-repeat_message = dict()
-for thisGrpID in setting.group_id():
-    properties = ['message', 'user_id', 'times']
-    repeat_message[thisGrpID] = {info: '' for info in properties}
+bot = PooledCQHttp(
+    api_root='http://127.0.0.1:5700/',
+    pool_size=int(setting.read_config('system', 'api_pool')),
+    timeout=(3, float(setting.read_config('system', 'api_timeout'))),
+    retries=int(setting.read_config('system', 'api_retries'))
+)
+# 集资, 口袋48和微博, PK分别使用独立的线程池, 慢任务不会占用其他任务的线程
+# 每个任务同时只运行一个实例, 错过的运行合并为一次
+sched = BackgroundScheduler(
+    executors={
+        'default': ThreadPoolExecutor(2),
+        'fund': ThreadPoolExecutor(2),
+        'social': ThreadPoolExecutor(2),
+        'pk': ThreadPoolExecutor(4),
+    },
+    jobstores={
+        'default': MemoryJobStore(),
+        # PK的增量快照任务需要在重启后保留
+        'pk': SQLAlchemyJobStore(engine=engine),
+    },
+    job_defaults={'coalesce': True, 'max_instances': 1}
+)
+monitor = JobMonitor()
+# 关键字命令可能需要访问网络, 和撤回禁言分开执行, 避免互相阻塞
+# 撤回禁言只用一个线程, 保证同一个群的消息按顺序检查
+command_pool = BoundedExecutor('command',
+                               int(setting.read_config('system', 'workers')),
+                               int(setting.read_config('system', 'queue')))
+moderation_pool = BoundedExecutor('moderation', 1,
+                                  int(setting.read_config('system', 'queue')))
+# 口袋48和微博的轮询间隔, 定时任务按照最短间隔运行, 没有新消息时跳过一部分
+pocket48_interval = AdaptiveInterval(
+    float(setting.read_config('pocket48', 'interval')),
+    float(setting.read_config('pocket48', 'max_interval'))
+)
+weibo_interval = AdaptiveInterval(
+    float(setting.read_config('weibo', 'interval')),
+    float(setting.read_config('weibo', 'max_interval'))
+)
+# 群消息的发送队列, 每个群和每个优先级单独限速
+dispatcher = Dispatcher({
+    priority: (float(setting.read_config('system', f'{name}_rate')),
+               int(setting.read_config('system', f'{name}_burst')))
+    for priority, name in [(MODERATION, 'moderation'),
+                           (REPLY, 'reply'),
+                           (BROADCAST, 'send')]
+})
+# 已经安排了任务的PK项目, 标题 -> PK配置的指纹
+pk_job_fingerprints = dict()
+# 上一次安排PK任务时的配置版本
+pk_jobs_version = None
 
 
 def send_message(message_list: list):
-    """向配置文件当中指定的群群发消息"""
+    """向配置文件当中指定的群群发消息, 消息放入发送队列后立即返回"""
     for message in message_list:
         for grp_id in setting.group_id():
-            bot.send_group_msg_async(group_id=grp_id,
-                                     message=message,
-                                     auto_escape=False)
-            time.sleep(0.5)
+            dispatcher.send_group_msg(bot, grp_id, message)
+    if message_list:
+        logger.debug('发送队列中共有%d条消息', dispatcher.depth())
+
+
+def reply(context, message, **kwargs):
+    """以交互回复的优先级回复群消息"""
+    dispatcher.submit(context['group_id'], bot.send, context, message,
+                      priority=REPLY, **kwargs)
+
+
+class OutboxDelivery(object):
+    """发件箱中的一条信息, 向全部群发送完成之后从发件箱中删除\n
+    某个群发送失败时等待一段时间后重试, 超过重试次数则放弃这个群并记录在日志中,
+    避免一个一直失败的群让这条信息永远留在发件箱里.
+    """
+
+    def __init__(self, outbox_id: int, message: str, group_list: list):
+        self.outbox_id = outbox_id
+        self.message = message
+        self._remaining = set(group_list)
+        self._attempts = dict()
+        self._lock = threading.Lock()
+
+    def send(self, grp_id: int):
+        """向一个群发送信息, 由发送队列调用"""
+        try:
+            bot.send_group_msg(group_id=grp_id, message=self.message,
+                               auto_escape=False)
+        except Exception as e:
+            with self._lock:
+                attempts = self._attempts.get(grp_id, 0) + 1
+                self._attempts[grp_id] = attempts
+            retries = int(setting.read_config('system', 'outbox_retries'))
+            if attempts <= retries:
+                delay = 2 ** attempts
+                logger.warning('向群%s发送信息%d失败, %d秒后第%d次重试: %s',
+                               grp_id, self.outbox_id, delay, attempts, str(e))
+                timer = threading.Timer(delay, dispatcher.submit,
+                                        (grp_id, self.send, grp_id))
+                timer.daemon = True
+                timer.start()
+                return
+            logger.error('向群%s发送信息%d失败%d次, 放弃发送: %s',
+                         grp_id, self.outbox_id, attempts, self.message)
+        with self._lock:
+            self._remaining.discard(grp_id)
+            finished = not self._remaining
+        if finished:
+            with session_scope() as session:
+                fund.remove_outbox(session, self.outbox_id)
+                session.commit()
+
+
+def send_outbox(outbox_list: list):
+    """把发件箱中的信息放入发送队列"""
+    group_list = setting.group_id()
+    for outbox_id, message in outbox_list:
+        delivery = OutboxDelivery(outbox_id, message, group_list)
+        for grp_id in group_list:
+            dispatcher.submit(grp_id, delivery.send, grp_id)
+
+
+def replay_outbox():
+    """重新发送上次运行时没有发送完成的信息, 过期的信息直接删除"""
+    try:
+        max_age = int(setting.read_config('system', 'outbox_max_age'))
+        with session_scope() as session:
+            expired = fund.expire_outbox(session, max_age)
+            session.commit()
+            outbox_list = fund.get_outbox(session)
+        if expired:
+            logger.warning('发件箱中有%d条信息超过%d秒没有发送完成, 已经删除',
+                           expired, max_age)
+        if outbox_list:
+            logger.info('发件箱中有%d条未发送的信息, 重新发送', len(outbox_list))
+        send_outbox(outbox_list)
+    except Exception as e:
+        logger.error(str(e), exc_info=True)
 
 
 # 发送集资信息
@@ -45,29 +173,29 @@ def send_raise_message(force=False):
     ``force``: 是否无视项目更新情况, 强行检索搜索项目.\n
     """
     try:
-        session = sessionmaker(bind=engine)()
         logger.info('开始检查集资信息')
-        message_list = fund.check_new_order(session, force)
-        send_message(message_list)
-        session.commit()
+        with session_scope() as session:
+            message_list = fund.check_new_order(session, force)
+            # 信息和订单一起提交, 提交成功之后再发送
+            outbox_list = fund.add_outbox(session, message_list)
+            session.commit()
+        send_outbox(outbox_list)
     except Exception as e:
         logger.error(str(e), exc_info=True)
     finally:
-        session.close()
         logger.info('集资信息检查完成')
 
 
 def check_new_project():
     """查找并自动向数据库添加新订单"""
     try:
-        session = sessionmaker(bind=engine)()
         logger.info('开始检查新项目')
-        fund.find_new_project(session)
-        session.commit()
+        with session_scope() as session:
+            fund.find_new_project(session)
+            session.commit()
     except Exception as e:
         logger.error(str(e), exc_info=True)
     finally:
-        session.close()
         logger.info('新项目检查完成')
 
 
@@ -76,49 +204,120 @@ def send_pk_message(pk_data):
     message = fund.pk.get_pk_message(pk_data)
     send_groups = setting.group_id() + pk_data['extend_qq_groups']
     for grp_id in send_groups:
-        bot.send_group_msg_async(group_id=grp_id,
-                                 message=message,
-                                 auto_escape=False)
-        time.sleep(0.5)
+        dispatcher.send_group_msg(bot, grp_id, message)
 
 
-def pk_init():
-    """PK项目初始化"""
-    for pk_data in setting.pk_datas():
-        if pk_data['title'] in pk_mission_started:
+def pk_job_id(title: str, spot: int = None) -> str:
+    """PK相关任务的id, 播报任务为``pk:标题``, 快照任务为``pk:标题:spot:序号``"""
+    if spot is None:
+        return f'pk:{title}'
+    return f'pk:{title}:spot:{spot}'
+
+
+def _pk_job_title(job_id: str) -> str:
+    """从PK任务的id中取出PK的标题"""
+    title = job_id[len('pk:'):]
+    if ':spot:' in title:
+        title = title[:title.rindex(':spot:')]
+    return title
+
+
+def schedule_pk(pk_config: setting.PKConfig, pk_interval: int):
+    """为一个PK安排播报任务和增量快照任务"""
+    pk_data = pk_config.data
+    title = pk_config.title
+    if pk_data['battle_config']['type'] == 'increase':
+        now = time.time()
+        if pk_config.start > now:
+            # 如果还没开始, 先保存零状态
+            fund.pk.cache_pk_amount(pk_data)
+        # 获取增量的时间节点, 快照任务保存在数据库中, 重启之后依然有效
+        time_list = pk_data['battle_config']['time_spot']
+        for spot, time_spot in enumerate(time_list):
+            if time.mktime(time.strptime(time_spot,
+                                         '%Y-%m-%d %H:%M:%S')) <= now:
+                continue
+            sched.add_job('fund.pk:cache_pk_amount',
+                          'date',
+                          run_date=time_spot,
+                          args=[pk_data],
+                          id=pk_job_id(title, spot),
+                          jobstore='pk',
+                          executor='pk',
+                          misfire_grace_time=None,
+                          replace_existing=True)
+    logger.info('对%s项目的PK播报将于%s启动,每%d秒钟一次',
+                title, pk_data['start_time'], pk_interval)
+    sched.add_job(
+        monitor.wrap(f'PK播报:{title}', pk_interval)(send_pk_message),
+        'interval',
+        seconds=pk_interval,
+        start_date=pk_data['start_time'],
+        end_date=pk_data['end_time'],
+        args=[pk_data],
+        id=pk_job_id(title),
+        executor='pk',
+        replace_existing=True
+    )
+
+
+def reconcile_pk_jobs():
+    """根据PK配置增加, 替换或者删除PK任务\n
+    只有PK配置或者播报间隔发生变化时才会执行.
+    """
+    global pk_jobs_version
+    pk_configs = setting.pk_configs()
+    pk_interval = int(setting.read_config('pk', 'interval'))
+    version = (setting.pk_registry.version, pk_interval)
+    if version == pk_jobs_version:
+        return
+    now = time.time()
+    current = dict()
+    for pk_config in pk_configs:
+        if pk_config.is_over(now):
             continue
-        if pk_data['battle_config']['type'] == 'increase':
-            if time.mktime(time.strptime(pk_data['start_time'],
-                                         '%Y-%m-%d %H:%M:%S')) > time.time():
-                # 如果还没开始, 先保存零状态
-                fund.pk.cache_pk_amount(pk_data)
-            # 获取增量的时间节点
-            time_list = pk_data['battle_config']['time_spot']
-            for time_spot in time_list:
-                sched.add_job(fund.pk.cache_pk_amount,
-                              'date',
-                              run_date=time_spot,
-                              args=[pk_data])
-        pk_interval = int(setting.read_config('pk', 'interval'))
-        logger.info('对%s项目的PK播报将于%s启动,每%d秒钟一次',
-                    pk_data['title'], pk_data['start_time'], pk_interval)
-        sched.add_job(
-            send_pk_message,
-            'interval',
-            seconds=pk_interval,
-            start_date=pk_data['start_time'],
-            end_date=pk_data['end_time'],
-            args=[pk_data]
-        )
-        pk_mission_started.append(pk_data['title'])
+        fingerprint = json.dumps([pk_config.data, pk_interval],
+                                 sort_keys=True, ensure_ascii=False)
+        current[pk_config.title] = (pk_config, fingerprint)
+    # 删除已经被移除或者修改过的PK的任务
+    for job in sched.get_jobs():
+        if not job.id.startswith('pk:'):
+            continue
+        title = _pk_job_title(job.id)
+        if title not in current:
+            job.remove()
+        elif title in pk_job_fingerprints:
+            if pk_job_fingerprints[title] != current[title][1]:
+                job.remove()
+        elif job.args[0] != current[title][0].data:
+            # 上次运行时保存在数据库中的快照任务, 配置没有变化时保留,
+            # 停机期间错过的快照会在启动后补上
+            job.remove()
+    for title in list(pk_job_fingerprints):
+        if (title not in current
+                or pk_job_fingerprints[title] != current[title][1]):
+            logger.info('PK项目%s的配置已经变化, 移除原有的任务', title)
+            del pk_job_fingerprints[title]
+    for title, (pk_config, fingerprint) in current.items():
+        if title in pk_job_fingerprints:
+            continue
+        schedule_pk(pk_config, pk_interval)
+        pk_job_fingerprints[title] = fingerprint
+    pk_jobs_version = version
 
 
 # 发送口袋48消息
 def send_pocket48_message():
     """发送口袋48信息"""
+    if not pocket48_interval.due():
+        return
     try:
         logger.info('开始检查口袋48消息')
         message_list = pocket48.get_messages()
+        if message_list:
+            pocket48_interval.hit()
+        else:
+            pocket48_interval.miss()
         message_list.reverse()
         send_message(message_list)
     except Exception as e:
@@ -130,9 +329,15 @@ def send_pocket48_message():
 # 发送微博消息
 def send_weibo_message():
     """发送微博信息"""
+    if not weibo_interval.due():
+        return
     try:
         logger.info('开始检查微博消息')
         message_list = weibo.get_message()
+        if message_list:
+            weibo_interval.hit()
+        else:
+            weibo_interval.miss()
         message_list.reverse()
         send_message(message_list)
     except Exception as e:
@@ -141,83 +346,134 @@ def send_weibo_message():
         logger.info('微博检查完成')
 
 
+def _route_version() -> tuple:
+    """返回命令路由依赖的配置版本."""
+    setting.pk_configs()
+    return setting.config.version, setting.pk_registry.version
+
+
+router = CommandRouter(_route_version)
+
+
+def reply_pk(pk_config: setting.PKConfig, context):
+    """回复PK进展"""
+    if pk_config.is_over():
+        return
+    message = fund.pk.get_pk_message(pk_config.data)
+    reply(context, message)
+
+
+@router.provider
+def pk_routes():
+    """为每个尚未结束的PK生成关键字命令"""
+    for pk_config in setting.pk_configs():
+        if pk_config.is_over():
+            continue
+        texts = ['PK', 'pk', 'Pk'] + pk_config.data['key_word']
+        groups = setting.all_group_id_set() | pk_config.groups
+        yield texts, groups, functools.partial(reply_pk, pk_config)
+
+
+@router.command('集资', groups=setting.all_group_id_set)
+def reply_project_list(context):
+    """回复集资项目列表"""
+    with session_scope() as session:
+        message = fund.get_project_list_message(session)
+    reply(context, message)
+
+
+@router.command('重载卡牌', groups=setting.dev_group_id)
+def reply_reload_cards(context):
+    """修改卡牌之后重新读取卡牌池"""
+    reload_card_pool()
+    reply(context, '卡牌池将在下次抽卡时重新读取')
+
+
+@router.command('补档', groups=setting.all_group_id_set)
+def reply_intro(context):
+    """回复补档和偶像介绍\n
+    开启``intro_forward``时把全部分段合并为一条转发消息, 只需要调用一次API.
+    """
+    message_list = setting.intro()
+    if setting.intro_forward():
+        nodes = [
+            {'type': 'node', 'data': {
+                'name': setting.read_config('system', 'nickname'),
+                'uin': str(context['self_id']),
+                'content': message
+            }}
+            for message in message_list
+        ]
+        dispatcher.submit(context['group_id'], bot.send_group_forward_msg,
+                          group_id=context['group_id'], messages=nodes,
+                          priority=REPLY)
+        return
+    for message in message_list:
+        reply(context, message)
+
+
+def moderate(context):
+    """敏感词撤回与重复刷屏禁言"""
+    word_list = setting.shutword_matcher().find_all(context['message'])
+    if word_list:
+        dispatcher.submit(context['group_id'], bot.delete_msg,
+                          message_id=context['message_id'],
+                          priority=MODERATION)
+        logger.info('成员%s的消息%s因为含有敏感词%s被撤回',
+                    context['user_id'], context['message'],
+                    ','.join(word_list))
+    reason = setting.flood_detector().check(context['group_id'],
+                                            context['user_id'],
+                                            context['message'])
+    if reason is not None:
+        dispatcher.submit(context['group_id'], bot.set_group_ban,
+                          group_id=context['group_id'],
+                          user_id=context['user_id'],
+                          duration=setting.ban_duration(),
+                          priority=MODERATION)
+        if reason == flood.REPEAT:
+            logger.info('成员%s因为重复发言刷屏被禁言', context['user_id'])
+        else:
+            logger.info('成员%s因为发言过于频繁被禁言', context['user_id'])
+
+
 @bot.on_message()
 def handle_msg(context):
     """关键字响应\n
     目前设定了PK, 集资, 补档, 以及关键字撤回和重复刷屏禁言.
+    命令通过``router``查找, 不是命令的消息直接进入撤回和禁言的检查.
+    所有处理都交给线程池, 收到上报后立即返回.
     """
     if (context['user_id'] != context['self_id']
             and context['message_type'] == 'group'):
-        check_group_list = setting.group_id() + setting.dev_group_id()
-        for pk_data in setting.pk_datas():
-            if time.mktime(time.strptime(pk_data['end_time'],
-                                         '%Y-%m-%d %H:%M:%S')) < time.time():
-                continue
-            if (context['group_id'] in pk_data['extend_qq_groups']
-                    or context['group_id'] in check_group_list):
-                if (context['message'] in ['PK', 'pk', 'Pk']
-                        or context['message'] in pk_data['key_word']):
-                    message = fund.pk.get_pk_message(pk_data)
-                    bot.send(context, message)
-        if (context['group_id'] in setting.group_id()
-                or context['group_id'] in setting.dev_group_id()):
-            if context['message'] == '集资':
-                session = sessionmaker(bind=engine)()
-                message = ''
-                project_list = fund.get_started_project(session)
-                if project_list.count() > 0:
-                    for project in project_list:
-                        message += f'{project.title}(准备中):{project.link()}\n'
-                project_list = fund.get_prepared_project(session)
-                if project_list.count() > 0:
-                    for project in project_list:
-                        message += f'{project.title}(准备中):{project.link()}\n'
-                if message == '':
-                    message = '暂时没有集资项目'
-                session.close()
-                bot.send(context, message.rstrip('\n'))
-            if context['message'] == '补档':
-                intro_pos = setting.read_config('system', 'intro')
-                f = open(intro_pos, 'r', -1, 'utf-8')
-                ori_message = f.read()
-                message_list = ori_message.split('$')
-                for message in message_list:
-                    bot.send(context, message)
-        # 敏感词撤回与重复刷屏禁言
-        if context['group_id'] in setting.group_id():
-            for word in setting.shutword():
-                if word in context['message']:
-                    bot.delete_msg(message_id=context['message_id'])
-                    logger.info('成员%s的消息%s因为含有敏感词%s被撤回',
-                                context['user_id'], context['message'], word)
-            prev_message = repeat_message[context['group_id']]['message']
-            prev_user = repeat_message[context['group_id']]['user_id']
-            if (context['message'] == prev_message
-                    and context['user_id'] == prev_user):
-                repeat_message[context['group_id']]['time'] += 1
-                logger.debug('成员%s重复发言第%d次', context['user_id'],
-                             repeat_message[context['group_id']]['time'])
-            else:
-                repeat_message[context['group_id']]['time'] = 0
-            repeat_message[context['group_id']]['message'] = context['message']
-            repeat_message[context['group_id']]['user_id'] = context['user_id']
-            if repeat_message[context['group_id']]['time'] >= 4:
-                bot.set_group_ban(group_id=context['group_id'],
-                                  user_id=context['user_id'],
-                                  duration=60 * 60)
-                logger.info('成员%s因为重复发言刷屏被禁言一小时', context['user_id'])
+        if context['group_id'] in setting.group_id_set():
+            moderation_pool.submit(moderate, context)
+        for handler in router.lookup(context['group_id'], context['message']):
+            command_pool.submit(handler, context)
+
+
+def send_welcome(context):
+    """发送欢迎消息"""
+    welcome = [
+        {'type': 'text', 'data': {'text': '欢迎'}},
+        {'type': 'at', 'data': {'qq': str(context['user_id'])}},
+        {'type': 'text', 'data': {'text': f'加入本群\n{setting.welcome()}'}}
+    ]
+    reply(context, welcome, auto_escape=True)
 
 
 @bot.on_notice('group_increase')
 def handle_group_increase(context):
     """加群发送欢迎消息"""
-    if context['group_id'] in setting.group_id():
-        welcome = [
-            {'type': 'text', 'data': {'text': '欢迎'}},
-            {'type': 'at', 'data': {'qq': str(context['user_id'])}},
-            {'type': 'text', 'data': {'text': f'加入本群\n{setting.welcome()}'}}
-        ]
-        bot.send(context, message=welcome, auto_escape=True)
+    if context['group_id'] in setting.group_id_set():
+        command_pool.submit(send_welcome, context)
+
+
+def watchdog():
+    """检查卡住的定时任务, 并记录任务和API的统计"""
+    monitor.check(float(setting.read_config('system', 'watchdog_factor')))
+    logger.debug('任务运行统计: %s', monitor.summary())
+    logger.debug('API调用统计: %s', bot.stats.summary())
 
 
 # TODO:加群验证处理
@@ -242,51 +498,61 @@ if __name__ == '__main__':
     )
     logging.root.addHandler(shandler)
 
+    # 升级旧版本的数据库
+    migrate(engine)
+    # 模版有错误时在启动时报错, 而不是等到播报的时候
+    templates()
     # 集资信息播报
-    raise_interval = int(setting.read_config('fund', 'interval'))
-    if raise_interval:
-        send_raise_message(True)
+    raise_seconds = int(setting.read_config('fund', 'interval'))
+    if raise_seconds:
+        replay_outbox()
+        send_raise_message()
         sched.add_job(
-            send_raise_message,
+            monitor.wrap('集资播报', raise_seconds)(send_raise_message),
             'interval',
-            seconds=raise_interval,
-            misfire_grace_time=raise_interval,
-            coalesce=True
+            seconds=raise_seconds,
+            misfire_grace_time=raise_seconds,
+            executor='fund'
         )
     # 集资项目自动添加
-    autofind_interval = int(setting.read_config('fund', 'autofind'))
-    if autofind_interval:
+    autofind_seconds = int(setting.read_config('fund', 'autofind'))
+    if autofind_seconds:
         check_new_project()
         sched.add_job(
-            check_new_project,
+            monitor.wrap('项目检查', autofind_seconds)(check_new_project),
             'interval',
-            seconds=autofind_interval,
-        )
-    # PK项目自动初始化
-    pkcheck_interval = int(setting.read_config('pk', 'interval')) / 2
-    if pkcheck_interval:
-        sched.add_job(
-            pk_init,
-            'interval',
-            minutes=pkcheck_interval
+            seconds=autofind_seconds,
+            executor='fund'
         )
     # 口袋48消息播报
-    pocket48_interval = int(setting.read_config('pocket48', 'interval'))
-    if pocket48_interval:
+    pocket48_seconds = int(setting.read_config('pocket48', 'interval'))
+    if pocket48_seconds:
         sched.add_job(
-            send_pocket48_message,
+            monitor.wrap('口袋48播报', pocket48_seconds)(send_pocket48_message),
             'interval',
-            seconds=pocket48_interval
+            seconds=pocket48_seconds,
+            executor='social'
         )
     # 微博消息播报
-    weibo_interval = int(setting.read_config('weibo', 'interval'))
-    if weibo_interval:
+    weibo_seconds = int(setting.read_config('weibo', 'interval'))
+    if weibo_seconds:
         sched.add_job(
-            send_weibo_message,
+            monitor.wrap('微博播报', weibo_seconds)(send_weibo_message),
             'interval',
-            seconds=weibo_interval
+            seconds=weibo_seconds,
+            executor='social'
         )
+    # 卡住任务的检查
+    sched.add_job(watchdog, 'interval', seconds=60)
     # 开始任务执行
     sched.start()
+    # PK任务的安排, 配置文件发生变化时才会调整任务
+    reconcile_pk_jobs()
+    sched.add_job(
+        monitor.wrap('PK配置检查', 60)(reconcile_pk_jobs),
+        'interval',
+        seconds=60,
+        executor='pk'
+    )
     # Docker虚拟网关地址 172.17.0.1
     bot.run(host='172.17.0.1', port=8080)
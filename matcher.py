@@ -0,0 +1,125 @@
+from collections import deque
+from typing import Iterable, List
+
+
+class WordMatcher(object):
+    """基于Aho-Corasick自动机的多关键词匹配器.
+    构建一次之后, 每条消息只需要扫描一遍就能找出全部命中的关键词.
+    ### Args:
+    ``words``: 需要匹配的关键词, 空字符串会被忽略.\n
+    ### Attributes:
+    ``find_all``: 返回消息中命中的全部关键词.\n
+    ``search``: 消息中是否含有任意一个关键词.\n
+    """
+
+    def __init__(self, words: Iterable[str]):
+        # 每个状态保存转移表, 失败指针以及在该状态结束的关键词
+        self._goto = [dict()]
+        self._fail = [0]
+        self._output = [list()]
+        self.words = list()
+        for word in words:
+            if word and word not in self.words:
+                self.words.append(word)
+                self._insert(word)
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def _insert(self, word: str):
+        """把关键词插入字典树."""
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append(dict())
+                self._fail.append(0)
+                self._output.append(list())
+            state = next_state
+        self._output[state].append(word)
+
+    def _build(self):
+        """按照广度优先的顺序计算失败指针, 并合并输出."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = (
+                    self._output[next_state]
+                    + self._output[self._fail[next_state]]
+                )
+
+    def _scan(self, text: str):
+        """扫描文本, 依次产生命中的关键词."""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                yield from output[state]
+
+    def find_all(self, text: str) -> List[str]:
+        """返回文本中命中的全部关键词, 按首次出现的顺序去重.
+        ### Args:
+        ``text``: 需要检查的文本.\n
+        ### Result:
+        ``word_list``: 命中的关键词列表, 没有命中时为空列表.\n
+        """
+        if not self.words:
+            return list()
+        word_list = list()
+        for word in self._scan(text):
+            if word not in word_list:
+                word_list.append(word)
+        return word_list
+
+    def search(self, text: str) -> bool:
+        """文本中是否含有任意一个关键词."""
+        for _ in self._scan(text):
+            return True
+        return False
+
+
+if __name__ == '__main__':
+    # 与逐个关键词查找的原始做法进行比较
+    import random
+    import timeit
+
+    random.seed(433)
+    charset = [chr(code) for code in range(0x4e00, 0x4e00 + 500)]
+    words = [''.join(random.choices(charset, k=random.randint(2, 4)))
+             for _ in range(300)]
+    messages = [''.join(random.choices(charset, k=random.randint(5, 120)))
+                for _ in range(1000)]
+    messages[::50] = [message + words[0] for message in messages[::50]]
+
+    def loop_match():
+        for message in messages:
+            [word for word in words if word in message]
+
+    matcher = WordMatcher(words)
+
+    def automaton_match():
+        for message in messages:
+            matcher.find_all(message)
+
+    for message in messages:
+        assert (set(matcher.find_all(message))
+                == {word for word in words if word in message})
+    loop_time = min(timeit.repeat(loop_match, number=10, repeat=3))
+    automaton_time = min(timeit.repeat(automaton_match, number=10, repeat=3))
+    print(f'{len(words)}个关键词, {len(messages)}条消息')
+    print(f'逐个查找: {loop_time * 100:.2f}ms/千条')
+    print(f'自动机: {automaton_time * 100:.2f}ms/千条')
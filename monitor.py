@@ -0,0 +1,118 @@
+import functools
+import logging
+import sys
+import threading
+import time
+import traceback
+
+logger = logging.getLogger('QQBot')
+
+# 运行时间直方图的分桶上限, 单位是秒
+BUCKETS = (0.5, 1, 2, 5, 10, 30, 60, 120, 300, float('inf'))
+
+
+def _format_buckets(counts: list) -> str:
+    """把直方图写成"<=上限:次数"的形式, 省略次数为0的分桶."""
+    parts = list()
+    for i, count in enumerate(counts):
+        if not count:
+            continue
+        if BUCKETS[i] == float('inf'):
+            parts.append(f'>{BUCKETS[i - 1]:g}秒:{count}')
+        else:
+            parts.append(f'<={BUCKETS[i]:g}秒:{count}')
+    return ' '.join(parts)
+
+
+class JobMonitor(object):
+    """定时任务的运行监控.
+    记录每个任务运行时间的直方图, 并且可以检查运行时间过长的任务,
+    在日志中输出该任务所在线程当前的调用栈.
+    ### Attributes:
+    ``wrap``: 包装需要监控的任务函数.\n
+    ``check``: 检查是否有卡住的任务.\n
+    ``summary``: 返回各个任务运行时间的统计.\n
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 任务名 -> (线程id, 开始时间, 任务间隔)
+        self._running = dict()
+        # 任务名 -> [各个分桶的次数, 总次数, 总耗时, 最大耗时]
+        self._stats = dict()
+
+    def wrap(self, name: str, interval: float):
+        """返回一个装饰器, 被装饰的函数每次运行都会被记录.
+        ### Args:
+        ``name``: 任务的名称.\n
+        ``interval``: 任务的运行间隔, 用于判断任务是否卡住.\n
+        """
+        def deco(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.monotonic()
+                with self._lock:
+                    self._running[name] = (threading.get_ident(),
+                                           start, interval)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self._record(name, time.monotonic() - start)
+            return wrapper
+        return deco
+
+    def _record(self, name: str, elapsed: float):
+        """记录一次运行的耗时."""
+        with self._lock:
+            self._running.pop(name, None)
+            stat = self._stats.get(name)
+            if stat is None:
+                stat = [[0] * len(BUCKETS), 0, 0.0, 0.0]
+                self._stats[name] = stat
+            for i, bound in enumerate(BUCKETS):
+                if elapsed <= bound:
+                    stat[0][i] += 1
+                    break
+            stat[1] += 1
+            stat[2] += elapsed
+            stat[3] = max(stat[3], elapsed)
+
+    def histogram(self, name: str) -> dict:
+        """返回某个任务运行时间的直方图, 键是分桶的上限."""
+        with self._lock:
+            stat = self._stats.get(name)
+            if stat is None:
+                return dict()
+            return dict(zip(BUCKETS, stat[0]))
+
+    def summary(self) -> str:
+        """返回一行可以写入日志的运行时间统计, 包括直方图中非空的分桶."""
+        with self._lock:
+            return '; '.join(
+                f'{name}: {stat[1]}次, 平均{stat[2] / stat[1]:.2f}秒, '
+                f'最长{stat[3]:.2f}秒, 分布[{_format_buckets(stat[0])}]'
+                for name, stat in sorted(self._stats.items())
+            )
+
+    def check(self, factor: float) -> list:
+        """检查运行时间超过``factor``个间隔的任务, 并输出其调用栈.
+        ### Args:
+        ``factor``: 允许的最长运行时间是任务间隔的多少倍.\n
+        ### Result:
+        ``stuck_list``: 卡住的任务名称列表.\n
+        """
+        now = time.monotonic()
+        with self._lock:
+            running = list(self._running.items())
+        frames = sys._current_frames()
+        stuck_list = list()
+        for name, (thread_id, start, interval) in running:
+            elapsed = now - start
+            if elapsed < interval * factor:
+                continue
+            stuck_list.append(name)
+            frame = frames.get(thread_id)
+            stack = ''.join(traceback.format_stack(frame)) if frame else ''
+            logger.warning('任务%s已经运行了%d秒, 超过了%d个间隔, 当前位置:\n%s',
+                           name, elapsed, factor, stack)
+        return stuck_list
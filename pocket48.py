@@ -43,7 +43,7 @@ def send_request(url: str, data: dict, has_login: bool = False) -> dict:
         'pa': get_pa()
     }
     if has_login:
-        header['token'] = setting.read_config('pocket48', 'token')
+        header['token'] = setting.read_state('pocket48', 'token')
     response = requests.post(url, data=json.dumps(data),
                              headers=header, verify=False, timeout=15).json()
     return response
@@ -59,7 +59,7 @@ def set_token() -> bool:
     response = send_request(url, data)
     if response['status'] == 200:
         token = response['content']['token']
-        setting.write_config('pocket48', 'token', token)
+        setting.write_state('pocket48', 'token', token)
         return True
     else:
         logger.error('登录口袋48时出错, 返回消息:%s', response['message'])
@@ -91,7 +91,7 @@ def _deal_messages(owner_id: int, room_id: int) -> list:
         response = send_request(url, data, True)
     # 处理消息列表
     message_list = list()
-    last_time = int(setting.read_config('pocket48', 'message_time'))
+    last_time = int(setting.read_state('pocket48', 'message_time'))
     for data in response['content']['message']:
         message = ''
         if data['msgTime'] < last_time:
@@ -203,8 +203,8 @@ def _deal_messages(owner_id: int, room_id: int) -> list:
             logger.error('发现了未知格式的信息: %s', json.dumps(message_ext))
         message_list.append(message)
     logger.info('口袋48信息处理完成, 共收取到%d条信息', len(message_list))
-    setting.write_config('pocket48', 'message_time',
-                         str(int(time.time()*1000)))
+    setting.write_state('pocket48', 'message_time',
+                        str(int(time.time()*1000)))
     return message_list
 
 
@@ -0,0 +1,67 @@
+import logging
+from typing import Callable, Iterable
+
+logger = logging.getLogger('QQBot')
+
+
+class CommandRouter(object):
+    """按照(群号, 消息内容)查找处理函数的命令路由.
+    路由表只在``version``的返回值变化时重建,
+    所以每条消息只需要一次字典查找, 增加命令不会增加其他消息的开销.
+    ### Args:
+    ``version``: 返回路由配置版本的函数, 返回值变化时重建路由表.\n
+    ### Attributes:
+    ``command``: 注册固定命令的装饰器.\n
+    ``provider``: 注册动态生成命令的函数的装饰器.\n
+    ``lookup``: 根据群号和消息内容查找处理函数.\n
+    """
+
+    def __init__(self, version: Callable[[], tuple]):
+        self._version = version
+        self._stamp = None
+        self._commands = list()
+        self._providers = list()
+        self._table = dict()
+
+    def command(self, *texts: str, groups: Callable[[], Iterable[int]]):
+        """注册固定命令.
+        ### Args:
+        ``texts``: 触发命令的消息内容.\n
+        ``groups``: 返回可以使用该命令的群号的函数.\n
+        """
+        def deco(handler):
+            self._commands.append((texts, groups, handler))
+            self._stamp = None
+            return handler
+        return deco
+
+    def provider(self, func: Callable[[], Iterable[tuple]]):
+        """注册动态生成命令的函数, 该函数返回若干个
+        ``(触发消息列表, 群号列表, 处理函数)``的元组."""
+        self._providers.append(func)
+        self._stamp = None
+        return func
+
+    def _rebuild(self):
+        """检查版本, 有变化时重建路由表."""
+        stamp = self._version()
+        if stamp == self._stamp:
+            return
+        routes = list()
+        for texts, groups, handler in self._commands:
+            routes.append((texts, groups(), handler))
+        for func in self._providers:
+            routes.extend(func())
+        table = dict()
+        for texts, groups, handler in routes:
+            for grp_id in groups:
+                for text in texts:
+                    table.setdefault((grp_id, text), list()).append(handler)
+        self._table = table
+        self._stamp = stamp
+        logger.debug('命令路由表已重建, 共%d项', len(table))
+
+    def lookup(self, grp_id: int, text: str) -> list:
+        """返回对应的处理函数列表, 不是命令时返回空列表."""
+        self._rebuild()
+        return self._table.get((grp_id, text), [])
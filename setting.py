@@ -1,11 +1,18 @@
 import os
 import json
-import configparser
+import threading
+import time
+
+from fund.setting import config_cache, WatchedFile
+from fund import state
+from flood import FloodDetector
+from matcher import WordMatcher
 
 cfg_name = 'setting.conf'
 BASE_DIR = os.path.dirname(__file__)
 FILE_PATH = os.path.join(BASE_DIR, cfg_name)
-cf = configparser.ConfigParser()
+# 与fund.setting共享同一个配置缓存
+config = config_cache(FILE_PATH)
 
 
 def read_config(section: str, option: str) -> str:
@@ -16,10 +23,7 @@ def read_config(section: str, option: str) -> str:
     ### Result:
     ``result``: 所读取到的配置值.
     """
-    with open(FILE_PATH, 'r', encoding='utf-8') as cfgfile:
-        cf.read_file(cfgfile)
-        result = cf.get(section, option)
-    return str(result)
+    return config.get(section, option)
 
 
 def write_config(section: str, option: str, value: str) -> str:
@@ -29,57 +33,208 @@ def write_config(section: str, option: str, value: str) -> str:
     ``option``: 在conf文件中的选项.\n
     ``value``: 需要写入的值.\n
     """
-    with open(FILE_PATH, 'r', encoding='utf-8') as cfgfile:
-        cf.read_file(cfgfile)
-        with open(FILE_PATH, 'w+', encoding='utf-8') as cfgfile2:
-            cf.set(section, option, value)
-            cf.write(cfgfile2)
+    config.write(section, option, value)
+
+
+def read_state(section: str, option: str) -> str:
+    """读取保存在数据库中的运行状态.
+    ### Args:
+    ``section``: 状态所属的模块.\n
+    ``option``: 状态的名称.\n
+    """
+    return state.read_state(section, option)
+
+
+def write_state(section: str, option: str, value: str):
+    """写入运行状态, 会在稍后批量写回数据库.
+    ### Args:
+    ``section``: 状态所属的模块.\n
+    ``option``: 状态的名称.\n
+    ``value``: 状态的值.\n
+    """
+    state.write_state(section, option, value)
+
+
+def _int_list(option: str) -> list:
+    """把[QQgroup]中逗号分隔的群号解析为整数列表."""
+    value = read_config('QQgroup', option)
+    return list(map(int, value.split(',')))
 
 
 def group_id() -> list:
     """返回一个需要发送信息的QQ群的列表."""
-    group_id = read_config('QQgroup', 'id')
-    array = list(map(int, group_id.split(',')))
-    return array
+    return config.derive('QQgroup.id', lambda: _int_list('id'))
 
 
 def dev_group_id() -> list:
     """返回一个开发和实验用的QQ群的列表."""
-    group_id = read_config('QQgroup', 'dev_id')
-    array = list(map(int, group_id.split(',')))
-    return array
+    return config.derive('QQgroup.dev_id', lambda: _int_list('dev_id'))
+
+
+def group_id_set() -> frozenset:
+    """返回需要发送信息的QQ群的集合, 用于快速判断群号."""
+    return config.derive('QQgroup.id.set', lambda: frozenset(group_id()))
+
+
+def all_group_id_set() -> frozenset:
+    """返回播报群和开发群合并后的集合."""
+    return config.derive(
+        'QQgroup.all.set',
+        lambda: frozenset(group_id()) | frozenset(dev_group_id())
+    )
 
 
 def welcome() -> str:
     """返回一个字符串, 是QQ群的欢迎词, 并且将conf当中的换行符还原."""
-    message = read_config('QQgroup', 'welcome')
-    return message.replace('\\n', '\n')
+    return config.derive(
+        'QQgroup.welcome',
+        lambda: read_config('QQgroup', 'welcome').replace('\\n', '\n')
+    )
 
 
 def shutword() -> list:
     """返回一个敏感词列表."""
-    shutword = read_config('QQgroup', 'shutword')
-    if shutword:
-        wordlist = shutword.split(',')
-    else:
-        wordlist = list()
-    return wordlist
+    def build():
+        shutword = read_config('QQgroup', 'shutword')
+        if shutword:
+            return shutword.split(',')
+        return list()
+    return config.derive('QQgroup.shutword', build)
+
 
+def shutword_matcher() -> WordMatcher:
+    """返回由敏感词列表构建的匹配器, 敏感词变化时才会重新构建."""
+    return config.derive('QQgroup.shutword.matcher',
+                         lambda: WordMatcher(shutword()))
+
+
+def _load_intro(path: str) -> list:
+    """读取补档介绍, 按照$分割成多段."""
+    with open(path, 'r', encoding='utf-8') as f:
+        ori_message = f.read()
+    return [message.strip() for message in ori_message.split('$')
+            if message.strip()]
+
+
+def intro() -> list:
+    """返回补档介绍的分段列表, 文件变化时才会重新读取."""
+    return config.derive(
+        'system.intro',
+        lambda: WatchedFile(read_config('system', 'intro'), _load_intro)
+    ).get()
+
+
+def intro_forward() -> bool:
+    """补档介绍是否以合并转发的形式发送."""
+    return config.derive('system.intro_forward',
+                         lambda: read_config('system', 'intro_forward') == '1')
+
+
+def flood_detector() -> FloodDetector:
+    """返回按照[flood]配置构建的刷屏检测器, 配置变化时重新构建."""
+    return config.derive('flood.detector', lambda: FloodDetector(
+        window=float(read_config('flood', 'window')),
+        repeat_limit=int(read_config('flood', 'repeat_limit')),
+        rate_limit=int(read_config('flood', 'rate_limit')),
+        max_users=int(read_config('flood', 'max_users'))
+    ))
+
+
+def ban_duration() -> int:
+    """返回刷屏禁言的时长, 单位是秒."""
+    return config.derive('flood.ban_duration',
+                         lambda: int(read_config('flood', 'ban_duration')))
+
+
+class PKConfig(object):
+    """经过解析的一个PK设置.
+    ### Args:
+    ``data``: 经过JSON解码的PK设置.\n
+    ### Attributes:
+    ``title``: PK项目的标题.\n
+    ``start``: PK开始的时间, 用Unix时间戳表示.\n
+    ``end``: PK结束的时间, 用Unix时间戳表示.\n
+    ``groups``: 除了配置的QQ群之外, 需要额外播报的QQ群.\n
+    """
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.title = data['title']
+        self.start = time.mktime(time.strptime(data['start_time'],
+                                               '%Y-%m-%d %H:%M:%S'))
+        self.end = time.mktime(time.strptime(data['end_time'],
+                                             '%Y-%m-%d %H:%M:%S'))
+        self.groups = frozenset(data['extend_qq_groups'])
+
+    def is_over(self, now: float = None) -> bool:
+        """PK是否已经结束."""
+        if now is None:
+            now = time.time()
+        return self.end < now
+
+
+class PKRegistry(object):
+    """PK设置的注册表.
+    每个配置文件只解析一次, 文件发生变化时才重新读取.
+    ### Attributes:
+    ``configs``: 全部PK设置的列表.\n
+    ``version``: PK设置发生变化的次数.\n
+    """
 
-def db_link() -> str:
-    """返回一个适用于SQLAlchemy的数据库链接."""
-    return 'sqlite:///'+read_config('system', 'database')
+    def __init__(self):
+        self.version = 0
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._files = dict()
+        self._configs = list()
+
+    def _file_list(self) -> list:
+        """返回全部PK配置文件的路径."""
+        pk_configs = read_config('pk', 'pk_lists')
+        if not pk_configs:
+            return list()
+        folder = read_config('pk', 'config_folder')
+        return [folder + '/' + name for name in pk_configs.split(',')]
+
+    def _refresh(self):
+        """检查配置文件, 有变化时重新解析."""
+        paths = self._file_list()
+        stamp = [config.version]
+        for path in paths:
+            stat = os.stat(path)
+            stamp.append((path, stat.st_mtime_ns, stat.st_size))
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            files = dict()
+            for path, file_stamp in zip(paths, stamp[1:]):
+                cached = self._files.get(path)
+                if cached is not None and cached[0] == file_stamp:
+                    files[path] = cached
+                    continue
+                with open(path, 'r', encoding='utf-8') as f:
+                    files[path] = (file_stamp, PKConfig(json.loads(f.read())))
+            self._files = files
+            self._configs = [files[path][1] for path in paths]
+            self._stamp = stamp
+            self.version += 1
+
+    def configs(self) -> list:
+        """返回全部PK设置的列表."""
+        self._refresh()
+        return self._configs
+
+
+pk_registry = PKRegistry()
+
+
+def pk_configs() -> list:
+    """返回一个列表, 里面每一项都是经过解析的``PKConfig``."""
+    return pk_registry.configs()
 
 
 def pk_datas() -> list:
     """返回一个列表, 里面每一项都是经过JSON解码的PK设置."""
-    pk_configs = read_config('pk', 'pk_lists')
-    if pk_configs:
-        pk_array = list(pk_configs.split(','))
-    else:
-        pk_array = list()
-    pk_datas = list()
-    for config in pk_array:
-        with open(read_config('pk', 'config_folder') + '/' + config, "r") as f:
-            pk_datas.append(json.loads(f.read()))
-    return pk_datas
+    return [pk_config.data for pk_config in pk_registry.configs()]
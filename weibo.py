@@ -20,14 +20,15 @@ def get_message() -> list:
     }
     response = requests.get(url, headers=header).json()
     message_list = list()
-    max_id = int(setting.read_config("weibo", "last_weibo"))
+    last_weibo = int(setting.read_state("weibo", "last_weibo"))
+    max_id = last_weibo
     for card in response['data']['cards']:
         try:
             card_id = int(card['mblog']['id'])
         except KeyError:
             card_id = 0
             continue
-        if card_id <= int(setting.read_config("weibo", "last_weibo")):
+        if card_id <= last_weibo:
             continue
         elif card_id > max_id:
             max_id = card_id
@@ -68,5 +69,6 @@ def get_message() -> list:
                 f"传送门: {card['scheme']}"
             )
         message_list.append(message)
-    setting.write_config("weibo", "last_weibo", str(max_id))
+    if max_id != last_weibo:
+        setting.write_state("weibo", "last_weibo", str(max_id))
     return message_list
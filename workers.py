@@ -0,0 +1,72 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('QQBot')
+
+
+class BoundedExecutor(object):
+    """有排队上限的线程池.
+    队列满时直接丢弃新任务并返回``False``, 避免消息处理无限堆积.
+    ### Args:
+    ``name``: 线程池的名称, 用于日志和线程名.\n
+    ``max_workers``: 最大线程数.\n
+    ``max_queue``: 除了正在执行的任务之外, 最多可以排队的任务数.\n
+    ### Attributes:
+    ``submit``: 提交任务.\n
+    ``depth``: 当前正在执行和排队的任务数.\n
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.capacity = max_workers + max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self._depth = 0
+
+    @property
+    def depth(self) -> int:
+        """当前正在执行和排队的任务数."""
+        return self._depth
+
+    def submit(self, func, *args, **kwargs) -> bool:
+        """提交任务, 队列已满时丢弃.
+        ### Args:
+        ``func``: 需要执行的函数, 其余参数会原样传入.\n
+        ### Result:
+        ``result``: 任务是否被接受.\n
+        """
+        if not self._slots.acquire(blocking=False):
+            # functools.partial之类的任务没有__name__
+            logger.warning('%s线程池已满(%d), 丢弃任务%s',
+                           self.name, self.capacity,
+                           getattr(func, '__name__', repr(func)))
+            return False
+        with self._lock:
+            self._depth += 1
+        try:
+            self._executor.submit(self._run, func, args, kwargs)
+        except Exception:
+            self._release()
+            raise
+        return True
+
+    def _release(self):
+        with self._lock:
+            self._depth -= 1
+        self._slots.release()
+
+    def _run(self, func, args, kwargs):
+        """执行任务并记录异常, 结束后释放排队名额."""
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            logger.error(str(e), exc_info=True)
+        finally:
+            self._release()
+
+    def shutdown(self, wait: bool = True):
+        """关闭线程池."""
+        self._executor.shutdown(wait=wait)